@@ -0,0 +1,261 @@
+/*
+ * heat_kernels.c - compiled Jacobi sweep and norm, masked sweeps and boundary update of a multimesh,
+ * loaded by jacobi_kernel.py through ctypes if present.
+ * Build it next to jacobi_kernel.py with
+ *
+ *     gcc -O3 -march=native -ffast-math -fopenmp -shared -fPIC heat_kernels.c -o heat_kernels.so -lm
+ *
+ * (without -fopenmp the pragmas are ignored and the loops run on one thread).
+ */
+#include <math.h>
+
+/*
+ * jacobi_sweep_f32, jacobi_sweep_f64 - one iteration of the Jacobi method with the 5-point
+ * pictorial operator, for float32 and float64 meshgrids.
+ *
+ * Inputs:
+ *     u : H x W meshgrid values from the previous iteration (C order)
+ *     v : H x W array to store the updated values, only the internal points are written
+ *     source : step**2*(q/k)/4 at point (i, j) is source[i*ssi + j*ssj], so that a value that
+ *     is the same at every point can be passed with ssi = ssj = 0
+ *     sums : if not NULL, set to the sums over the internal points of (v - u)**2 and v**2,
+ *     computed in the same pass as the update
+ */
+#define JACOBI_SWEEP(NAME, T)                                                           \
+void NAME(const T *u, T *v, const T *source, long ssi, long ssj, int H, int W,         \
+          double *sums)                                                                 \
+{                                                                                       \
+    double diffsq = 0., newsq = 0.;                                                     \
+    _Pragma("omp parallel for reduction(+:diffsq, newsq)")                              \
+    for (int i = 1; i < H - 1; i++) {                                                   \
+        const T *up = u + (long)(i - 1)*W, *mid = u + (long)i*W, *down = u + (long)(i + 1)*W; \
+        const T *s = source + i*ssi;                                                    \
+        T *out = v + (long)i*W;                                                         \
+        _Pragma("omp simd reduction(+:diffsq, newsq)")                                  \
+        for (int j = 1; j < W - 1; j++) {                                               \
+            T new = (T)0.25*(up[j] + down[j] + mid[j - 1] + mid[j + 1]) + s[j*ssj];     \
+            out[j] = new;                                                               \
+            diffsq += (double)(new - mid[j])*(new - mid[j]);                            \
+            newsq += (double)new*new;                                                   \
+        }                                                                               \
+    }                                                                                   \
+    if (sums) {                                                                         \
+        sums[0] = diffsq;                                                               \
+        sums[1] = newsq;                                                                \
+    }                                                                                   \
+}
+
+/*
+ * jacobi_two_step_f32, jacobi_two_step_f64 - two iterations of the Jacobi method fused into one
+ * pass over the meshgrid, as _jacobi_two_step_numba in jacobi_kernel.py. The meshgrid is split
+ * into tiles of tile_h x tile_w internal points, done in parallel. In each tile the first
+ * iteration is kept for three rows only, so u is read once and v written once for both.
+ *
+ * Inputs:
+ *     u, v, source, ssi, ssj : as in jacobi_sweep, v gets the values after two iterations
+ *     tile_h, tile_w : size of the tiles
+ *     sums : if not NULL, set to the sums over the internal points of (v - u)**2 and v**2
+ */
+#define JACOBI_TWO_STEP(NAME, T)                                                        \
+void NAME(const T *u, T *v, const T *source, long ssi, long ssj, int H, int W,         \
+          int tile_h, int tile_w, double *sums)                                         \
+{                                                                                       \
+    double diffsq = 0., newsq = 0.;                                                     \
+    int ntilesj = (W - 2 + tile_w - 1)/tile_w;                                          \
+    int ntiles = (H - 2 + tile_h - 1)/tile_h*ntilesj;                                   \
+    _Pragma("omp parallel reduction(+:diffsq, newsq)")                                  \
+    {                                                                                   \
+        T rows[3*(tile_w + 2)]; /* rows[(i - i0 + 1) % 3] holds the first iteration of row i */ \
+        _Pragma("omp for")                                                              \
+        for (int t = 0; t < ntiles; t++) {                                              \
+            int i0 = 1 + t/ntilesj*tile_h, j0 = 1 + t % ntilesj*tile_w;                 \
+            int i1 = i0 + tile_h < H - 1 ? i0 + tile_h : H - 1;                         \
+            int j1 = j0 + tile_w < W - 1 ? j0 + tile_w : W - 1;                         \
+            int ja = j0 - 1 > 1 ? j0 - 1 : 1, jb = j1 + 1 < W - 1 ? j1 + 1 : W - 1;     \
+            for (int i = i0 - 1; i <= i1; i++) {                                        \
+                T *row = rows + (i - i0 + 1) % 3*(tile_w + 2); /* row[j - j0 + 1] */     \
+                const T *mid = u + (long)i*W;                                           \
+                if (i == 0 || i == H - 1) {                                             \
+                    for (int j = j0 - 1; j <= j1; j++)                                  \
+                        row[j - j0 + 1] = mid[j];                                       \
+                } else {                                                                \
+                    const T *up = mid - W, *down = mid + W, *s = source + i*ssi;        \
+                    if (j0 == 1)                                                        \
+                        row[0] = mid[0];                                                \
+                    if (j1 == W - 1)                                                    \
+                        row[W - j0] = mid[W - 1];                                       \
+                    _Pragma("omp simd")                                                 \
+                    for (int j = ja; j < jb; j++)                                       \
+                        row[j - j0 + 1] = (T)0.25*(up[j] + down[j] + mid[j - 1] + mid[j + 1]) + s[j*ssj]; \
+                }                                                                       \
+                if (i > i0) { /* the first iteration is ready around row i - 1 */       \
+                    const T *up = rows + (i - i0 - 1) % 3*(tile_w + 2);                 \
+                    const T *md = rows + (i - i0) % 3*(tile_w + 2);                     \
+                    const T *s = source + (i - 1)*ssi, *old = u + (long)(i - 1)*W;      \
+                    T *out = v + (long)(i - 1)*W;                                       \
+                    _Pragma("omp simd reduction(+:diffsq, newsq)")                      \
+                    for (int j = j0; j < j1; j++) {                                     \
+                        int k = j - j0 + 1;                                             \
+                        T new = (T)0.25*(up[k] + row[k] + md[k - 1] + md[k + 1]) + s[j*ssj]; \
+                        out[j] = new;                                                   \
+                        diffsq += (double)(new - old[j])*(new - old[j]);                \
+                        newsq += (double)new*new;                                       \
+                    }                                                                   \
+                }                                                                       \
+            }                                                                           \
+        }                                                                               \
+    }                                                                                   \
+    if (sums) {                                                                         \
+        sums[0] = diffsq;                                                               \
+        sums[1] = newsq;                                                                \
+    }                                                                                   \
+}
+
+/*
+ * jacobi_norm_delta_f32, jacobi_norm_delta_f64 - norm of the difference between two H x W
+ * meshgrids a and b over the internal points, sqrt of the sum of (a - b)**2 in one pass.
+ */
+#define JACOBI_NORM_DELTA(NAME, T)                                                      \
+double NAME(const T *a, const T *b, int H, int W)                                       \
+{                                                                                       \
+    double diffsq = 0.;                                                                 \
+    _Pragma("omp parallel for reduction(+:diffsq)")                                     \
+    for (int i = 1; i < H - 1; i++) {                                                   \
+        const T *ai = a + (long)i*W, *bi = b + (long)i*W;                               \
+        _Pragma("omp simd reduction(+:diffsq)")                                         \
+        for (int j = 1; j < W - 1; j++)                                                 \
+            diffsq += (double)(ai[j] - bi[j])*(ai[j] - bi[j]);                          \
+    }                                                                                   \
+    return sqrt(diffsq);                                                                \
+}
+
+/*
+ * jacobi_sweep_masked - same as jacobi_sweep, but only the internal points of a multimesh
+ * (data >= 0) are updated, the others keep the value of u. Only for float64, as multimesh
+ * stores its values in double precision.
+ *
+ * Inputs:
+ *     u, v : as in jacobi_sweep
+ *     data : H x W int8 array classifying the points (internal >= 0, fictitious -1, ambient -2)
+ *     source : H x W array with step**2*(q/k)/4 of the material at each point
+ *     sums : as in jacobi_sweep, but over the points with data >= 0 only
+ */
+#define JACOBI_SWEEP_MASKED(NAME, T)                                                    \
+void NAME(const T *u, T *v, const signed char *data, const T *source, int H, int W,    \
+          double *sums)                                                                 \
+{                                                                                       \
+    double diffsq = 0., newsq = 0.;                                                     \
+    _Pragma("omp parallel for reduction(+:diffsq, newsq)")                              \
+    for (int i = 1; i < H - 1; i++) {                                                   \
+        const T *up = u + (long)(i - 1)*W, *mid = u + (long)i*W, *down = u + (long)(i + 1)*W; \
+        const T *s = source + (long)i*W;                                                \
+        const signed char *d = data + (long)i*W;                                        \
+        T *out = v + (long)i*W;                                                         \
+        _Pragma("omp simd reduction(+:diffsq, newsq)")                                  \
+        for (int j = 1; j < W - 1; j++) {                                               \
+            T new = (T)0.25*(up[j] + down[j] + mid[j - 1] + mid[j + 1]) + s[j];         \
+            new = d[j] >= 0 ? new : mid[j]; /* a select, so the loop is still vectorised */ \
+            out[j] = new;                                                               \
+            diffsq += (double)(new - mid[j])*(new - mid[j]);                            \
+            newsq += d[j] >= 0 ? (double)new*new : 0.;                                  \
+        }                                                                               \
+    }                                                                                   \
+    if (sums) {                                                                         \
+        sums[0] = diffsq;                                                               \
+        sums[1] = newsq;                                                                \
+    }                                                                                   \
+}
+
+/*
+ * redblack_sweep_masked - one iteration of the red-black Gauss-Seidel method with successive
+ * over-relaxation over the internal points of a multimesh (data >= 0), in place, for float64.
+ * The points with (i + j) even are updated first, then the odd ones.
+ *
+ * Inputs:
+ *     u : H x W meshgrid values, updated in place
+ *     data, source : as in jacobi_sweep_masked
+ *     omega : relaxation factor
+ *     sums : if not NULL, set to the sums over the points with data >= 0 of the squared change
+ *     and of the squared new values
+ */
+#define REDBLACK_SWEEP_MASKED(NAME, T)                                                  \
+void NAME(T *u, const signed char *data, const T *source, double omega, int H, int W,  \
+          double *sums)                                                                 \
+{                                                                                       \
+    double diffsq = 0., newsq = 0.;                                                     \
+    const T w = (T)omega;                                                               \
+    for (int colour = 0; colour < 2; colour++) {                                        \
+        _Pragma("omp parallel for reduction(+:diffsq, newsq)")                          \
+        for (int i = 1; i < H - 1; i++) {                                               \
+            T *up = u + (long)(i - 1)*W, *mid = u + (long)i*W, *down = u + (long)(i + 1)*W; \
+            const T *s = source + (long)i*W;                                            \
+            const signed char *d = data + (long)i*W;                                    \
+            for (int j = 1 + (i + 1 + colour) % 2; j < W - 1; j += 2) {                 \
+                T old = mid[j];                                                         \
+                T new = old + w*((T)0.25*(up[j] + down[j] + mid[j - 1] + mid[j + 1]) + s[j] - old); \
+                new = d[j] >= 0 ? new : old;                                            \
+                diffsq += (double)(new - old)*(new - old);                              \
+                newsq += d[j] >= 0 ? (double)new*new : 0.;                              \
+                mid[j] = new;                                                           \
+            }                                                                           \
+        }                                                                               \
+    }                                                                                   \
+    if (sums) {                                                                         \
+        sums[0] = diffsq;                                                               \
+        sums[1] = newsq;                                                                \
+    }                                                                                   \
+}
+
+/*
+ * update_bc - fictitious and ambient points of a (float64) multimesh, as in update_bc in
+ * jacobi_kernel.py. Each fictitious point is the average over its neighbouring
+ * internal points of the point two steps inside plus 2*h*step*(T - Ta)/k, with T and k at the
+ * nearest internal point. dirs only marks directions in which both points are internal, so
+ * only internal points of meshval are read and out may be meshval.
+ *
+ * Inputs:
+ *     meshval : meshgrid values with W columns
+ *     out : array of the same shape to write the fictitious and ambient points to
+ *     kmap : thermal conductivity at each point (float64)
+ *     fict, dirs : nfict x 2 (int64) indices of the fictitious points and nfict x 4 booleans, True
+ *     where there is an internal point in that direction (right, down, left, up)
+ *     ambient : nambient x 2 indices of the ambient points
+ *     natural : 1 for natural convection (h from the temperature), 0 for h = hforced
+ */
+#define UPDATE_BC(NAME, T)                                                              \
+void NAME(const T *meshval, T *out, const double *kmap, const long long *fict,          \
+          const unsigned char *dirs, long nfict, const long long *ambient, long nambient, \
+          int W, double step, int natural, double hforced)                              \
+{                                                                                       \
+    static const int di[4] = {0, 1, 0, -1}, dj[4] = {1, 0, -1, 0};                      \
+    const double Ta = 20. + 273.;                                                       \
+    _Pragma("omp parallel for")                                                         \
+    for (long p = 0; p < nfict; p++) {                                                  \
+        double total = 0.;                                                              \
+        int n = 0;                                                                      \
+        for (int d = 0; d < 4; d++) {                                                   \
+            if (dirs[4*p + d]) {                                                        \
+                long p1 = (fict[2*p] + di[d])*W + fict[2*p + 1] + dj[d];                \
+                long p2 = (fict[2*p] + 2*di[d])*W + fict[2*p + 1] + 2*dj[d];            \
+                double T1 = meshval[p1];                                                \
+                double h = natural ? -1.31e-6*cbrt(T1 - Ta) : hforced;                  \
+                total += 2*h*step*(T1 - Ta)/kmap[p1] + meshval[p2];                     \
+                n++;                                                                    \
+            }                                                                           \
+        }                                                                               \
+        /* points at the corner have no internal point next to them and will not affect any calculations */ \
+        out[fict[2*p]*W + fict[2*p + 1]] = (T)(n > 0 ? total/n : Ta);                   \
+    }                                                                                   \
+    for (long p = 0; p < nambient; p++)                                                 \
+        out[ambient[2*p]*W + ambient[2*p + 1]] = (T)Ta;                                 \
+}
+
+JACOBI_SWEEP(jacobi_sweep_f32, float)
+JACOBI_SWEEP(jacobi_sweep_f64, double)
+JACOBI_TWO_STEP(jacobi_two_step_f32, float)
+JACOBI_TWO_STEP(jacobi_two_step_f64, double)
+JACOBI_NORM_DELTA(jacobi_norm_delta_f32, float)
+JACOBI_NORM_DELTA(jacobi_norm_delta_f64, double)
+JACOBI_SWEEP_MASKED(jacobi_sweep_masked, double)
+REDBLACK_SWEEP_MASKED(redblack_sweep_masked, double)
+UPDATE_BC(update_bc, double)
@@ -0,0 +1,583 @@
+import ctypes
+import os
+import numpy as np
+
+try:
+    from numba import njit, prange, stencil
+except ImportError: # numba is optional - fall back to the numpy versions below
+    njit = None
+
+try:
+    _clib = ctypes.CDLL(os.path.join(os.path.dirname(os.path.abspath(__file__)), "heat_kernels.so"))
+    _clib.jacobi_two_step_f64 # missing if compiled from an older heat_kernels.c, which is then not used
+except (OSError, AttributeError): # so is heat_kernels.c, see the top of it for how to compile it
+    _clib = None
+
+USE_NUMBA = njit is not None # set to False to force the numpy versions
+USE_C = _clib is not None # set to False to use numba / numpy instead of the C kernels
+TILE_H = 32 # rows in a tile of the numba kernels
+TILE_W = 512 # columns in a tile, three rows of these fit in the L1 cache
+
+def _sumsq(a):
+    return np.einsum('ij,ij->', a, a, dtype = np.float64) # accumulate in double precision for float32 meshgrids
+
+_DI = np.array([0, 1, 0, -1]) # directions from a fictitious point to an internal point:
+_DJ = np.array([1, 0, -1, 0]) # right, down, left, up
+
+def _update_bc_numpy(meshval, meshvalnew, kmap, fict, dirs, ambient, step, natural, hforced):
+    total = np.zeros(fict.shape[0])
+    n = np.zeros(fict.shape[0])
+    for d in range(4):
+        p = np.nonzero(dirs[:, d])[0] # fictitious points with an internal point in direction d
+        i1, j1 = fict[p, 0] + _DI[d], fict[p, 1] + _DJ[d] # nearest point and the one after it
+        i2, j2 = fict[p, 0] + 2*_DI[d], fict[p, 1] + 2*_DJ[d]
+        T = meshval[i1, j1].astype(np.float64)
+        if natural:
+            h = -1.31e-6*np.cbrt(T - (20. + 273.)) # negative like hforced, heat leaves through the surface
+        else:
+            h = hforced
+        total[p] += 2*h*step*(T - (20. + 273.))/kmap[i1, j1] + meshval[i2, j2]
+        n[p] += 1
+    # points at the corner have no internal point next to them and will not affect any calculations
+    meshvalnew[fict[:, 0], fict[:, 1]] = np.where(n > 0, total/np.maximum(n, 1), 20. + 273.)
+    meshvalnew[ambient[:, 0], ambient[:, 1]] = 20. + 273.
+
+def _jacobi_update_numpy(src, dst, source):
+    inner = dst[1:-1, 1:-1] # view of the internal points
+    np.add(src[:-2, 1:-1], src[2:, 1:-1], out = inner)
+    np.add(inner, src[1:-1, :-2], out = inner)
+    np.add(inner, src[1:-1, 2:], out = inner)
+    np.multiply(inner, 1/4, out = inner)
+    np.add(inner, source[1:-1, 1:-1], out = inner)
+    return inner
+
+def _jacobi_sweep_numpy(src, dst, source, scratch):
+    inner = _jacobi_update_numpy(src, dst, source)
+    diff = np.subtract(inner, src[1:-1, 1:-1], out = scratch[1:-1, 1:-1])
+    return _sumsq(diff), _sumsq(inner)
+
+def _jacobi_two_step_numpy(src, dst, tmp, source):
+    _jacobi_update_numpy(src, tmp, source)
+    inner = _jacobi_update_numpy(tmp, dst, source)
+    diff = np.subtract(inner, src[1:-1, 1:-1], out = tmp[1:-1, 1:-1]) # tmp is not needed any more
+    return _sumsq(diff), _sumsq(inner)
+
+def _jacobi_sweep_masked_numpy(src, dst, interior, source, norms):
+    ii, jj = interior # only these points are gathered and written, the others are kept
+    new = 1/4*(src[ii - 1, jj] + src[ii + 1, jj] + src[ii, jj - 1] + src[ii, jj + 1]) + source[ii, jj]
+    dst[ii, jj] = new
+    if norms:
+        diff = new - src[ii, jj]
+        return np.einsum('i,i->', diff, diff, dtype = np.float64), np.einsum('i,i->', new, new, dtype = np.float64)
+
+def _redblack_sweep_numpy(u, source, norms):
+    H, W = u.shape
+    diffsq = 0.
+    newsq = 0.
+    for colour in (0, 1):
+        for i0 in (1, 2): # odd and even rows
+            j0 = 1 + (i0 + 1 + colour) % 2
+            rows = slice(i0, H - 1, 2)
+            cols = slice(j0, W - 1, 2)
+            new = 1/4*(u[i0 - 1:H - 2:2, cols] + u[i0 + 1:H:2, cols]
+            + u[rows, j0 - 1:W - 2:2] + u[rows, j0 + 1:W:2]) + source[rows, cols]
+            if norms:
+                diffsq += _sumsq(new - u[rows, cols])
+                newsq += _sumsq(new)
+            u[rows, cols] = new
+    return diffsq, newsq
+
+def _redblack_sweep_masked_numpy(u, data, source, omega, norms):
+    H, W = u.shape
+    diffsq = 0.
+    newsq = 0.
+    for colour in (0, 1):
+        for i0 in (1, 2): # odd and even rows
+            j0 = 1 + (i0 + 1 + colour) % 2
+            rows = slice(i0, H - 1, 2)
+            cols = slice(j0, W - 1, 2)
+            old = u[rows, cols]
+            new = old + omega*(1/4*(u[i0 - 1:H - 2:2, cols] + u[i0 + 1:H:2, cols]
+            + u[rows, j0 - 1:W - 2:2] + u[rows, j0 + 1:W:2]) + source[rows, cols] - old)
+            inside = data[rows, cols] >= 0
+            new = np.where(inside, new, old) # fictitious and ambient points are kept
+            if norms:
+                diffsq += _sumsq(new - old)
+                newsq += _sumsq(np.where(inside, new, 0.))
+            u[rows, cols] = new
+    return diffsq, newsq
+
+if _clib is not None:
+    for _f in (_clib.jacobi_sweep_f32, _clib.jacobi_sweep_f64):
+        _f.argtypes = [ctypes.c_void_p]*3 + [ctypes.c_long]*2 + [ctypes.c_int]*2 + [ctypes.c_void_p]
+        _f.restype = None
+    for _f in (_clib.jacobi_two_step_f32, _clib.jacobi_two_step_f64):
+        _f.argtypes = [ctypes.c_void_p]*3 + [ctypes.c_long]*2 + [ctypes.c_int]*4 + [ctypes.c_void_p]
+        _f.restype = None
+    for _f in (_clib.jacobi_norm_delta_f32, _clib.jacobi_norm_delta_f64):
+        _f.argtypes = [ctypes.c_void_p]*2 + [ctypes.c_int]*2
+        _f.restype = ctypes.c_double
+    # multimesh stores float64 only, so its kernels have no float32 version
+    _clib.jacobi_sweep_masked.argtypes = [ctypes.c_void_p]*4 + [ctypes.c_int]*2 + [ctypes.c_void_p]
+    _clib.jacobi_sweep_masked.restype = None
+    _clib.redblack_sweep_masked.argtypes = [ctypes.c_void_p]*3 + [ctypes.c_double] + [ctypes.c_int]*2 + [ctypes.c_void_p]
+    _clib.redblack_sweep_masked.restype = None
+    _clib.update_bc.argtypes = ([ctypes.c_void_p]*5 + [ctypes.c_long, ctypes.c_void_p, ctypes.c_long, ctypes.c_int,
+                                ctypes.c_double, ctypes.c_int, ctypes.c_double])
+    _clib.update_bc.restype = None
+
+def _use_c(src, dst, source):
+    return (USE_C and src.dtype in (np.float32, np.float64) and dst.dtype == src.dtype
+            and source.dtype == src.dtype and src.flags.c_contiguous and dst.flags.c_contiguous)
+
+def _use_c_masked(src, dst, data, source):
+    return (_use_c(src, dst, source) and src.dtype == np.float64 and source.flags.c_contiguous
+            and data.dtype == np.int8 and data.flags.c_contiguous)
+
+def _jacobi_sweep_masked_c(src, dst, data, source, norms):
+    sums = np.zeros(2)
+    _clib.jacobi_sweep_masked(src.ctypes.data, dst.ctypes.data, data.ctypes.data, source.ctypes.data, src.shape[0],
+                              src.shape[1], sums.ctypes.data if norms else None)
+    return sums[0], sums[1]
+
+def _redblack_sweep_masked_c(u, data, source, omega, norms):
+    sums = np.zeros(2)
+    _clib.redblack_sweep_masked(u.ctypes.data, data.ctypes.data, source.ctypes.data, omega, u.shape[0], u.shape[1],
+                                sums.ctypes.data if norms else None)
+    return sums[0], sums[1]
+
+def _update_bc_c(meshval, meshvalnew, kmap, fict, dirs, ambient, step, natural, hforced):
+    fict = np.ascontiguousarray(fict, dtype = np.int64) # no copy for the arrays from boundary_points
+    ambient = np.ascontiguousarray(ambient, dtype = np.int64)
+    dirs = np.ascontiguousarray(dirs, dtype = np.bool_)
+    kmap = np.ascontiguousarray(kmap, dtype = np.float64)
+    _clib.update_bc(meshval.ctypes.data, meshvalnew.ctypes.data, kmap.ctypes.data, fict.ctypes.data, dirs.ctypes.data,
+                    fict.shape[0], ambient.ctypes.data, ambient.shape[0], meshval.shape[1], step, natural, hforced)
+
+def _jacobi_sweep_c(src, dst, source, norms):
+    sums = np.zeros(2)
+    sweep = _clib.jacobi_sweep_f32 if src.dtype == np.float32 else _clib.jacobi_sweep_f64
+    sweep(src.ctypes.data, dst.ctypes.data, source.ctypes.data, source.strides[0]//source.itemsize,
+          source.strides[1]//source.itemsize, src.shape[0], src.shape[1], sums.ctypes.data if norms else None)
+    return sums[0], sums[1]
+
+def _jacobi_two_step_c(src, dst, source, norms):
+    sums = np.zeros(2)
+    two_step = _clib.jacobi_two_step_f32 if src.dtype == np.float32 else _clib.jacobi_two_step_f64
+    two_step(src.ctypes.data, dst.ctypes.data, source.ctypes.data, source.strides[0]//source.itemsize,
+             source.strides[1]//source.itemsize, src.shape[0], src.shape[1], TILE_H, TILE_W,
+             sums.ctypes.data if norms else None)
+    return sums[0], sums[1]
+
+if njit is not None:
+    @njit(cache = True)
+    def _update_bc_numba(meshval, meshvalnew, kmap, fict, dirs, ambient, step, natural, hforced):
+        for p in range(fict.shape[0]):
+            total = 0.
+            n = 0
+            for d in range(4):
+                if dirs[p, d]:
+                    i1, j1 = fict[p, 0] + _DI[d], fict[p, 1] + _DJ[d] # nearest point and the one after it
+                    i2, j2 = fict[p, 0] + 2*_DI[d], fict[p, 1] + 2*_DJ[d]
+                    T = meshval[i1, j1]
+                    if natural:
+                        h = -1.31e-6*np.cbrt(T - (20. + 273.)) # negative like hforced
+                    else:
+                        h = hforced
+                    total += 2*h*step*(T - (20. + 273.))/kmap[i1, j1] + meshval[i2, j2]
+                    n += 1
+            if n > 0:
+                meshvalnew[fict[p, 0], fict[p, 1]] = total/n
+            else:
+                meshvalnew[fict[p, 0], fict[p, 1]] = 20. + 273. # points at the corner, will not affect any calculations
+        for p in range(ambient.shape[0]):
+            meshvalnew[ambient[p, 0], ambient[p, 1]] = 20. + 273.
+
+    @stencil
+    def _five_point(u, source):
+        return 0.25*(u[0, 1] + u[0, -1] + u[1, 0] + u[-1, 0]) + source[0, 0]
+
+    @njit(parallel = True, fastmath = True, cache = True)
+    def _jacobi_stencil_numba(src, dst, source):
+        _five_point(src, source, out = dst) # a stencil must be called from njit, not from python
+        diffsq = 0.
+        newsq = 0.
+        for i in prange(1, src.shape[0] - 1):
+            for j in range(1, src.shape[1] - 1):
+                diffsq += (dst[i, j] - src[i, j])**2
+                newsq += dst[i, j]*dst[i, j]
+        return diffsq, newsq
+
+    @njit(parallel = True, fastmath = True, cache = True)
+    def _jacobi_sweep_masked_numba(src, dst, data, source):
+        H, W = src.shape
+        ntilesj = (W - 2 + TILE_W - 1)//TILE_W
+        ntiles = (H - 2 + TILE_H - 1)//TILE_H*ntilesj
+        diffsq = 0.
+        newsq = 0.
+        for t in prange(ntiles): # tiles as in _jacobi_sweep_numba
+            i0 = 1 + t//ntilesj*TILE_H
+            i1 = min(i0 + TILE_H, H - 1)
+            j0 = 1 + t % ntilesj*TILE_W
+            j1 = min(j0 + TILE_W, W - 1)
+            for i in range(i0, i1):
+                for j in range(j0, j1):
+                    new = 0.25*(src[i - 1, j] + src[i + 1, j] + src[i, j - 1] + src[i, j + 1]) + source[i, j]
+                    new = new if data[i, j] >= 0 else src[i, j] # a select rather than a branch, so the loop is still vectorised
+                    dst[i, j] = new
+                    diffsq += (new - src[i, j])**2
+                    newsq += new*new if data[i, j] >= 0 else 0. # internal points only, as without numba
+        return diffsq, newsq
+
+    @njit(parallel = True, fastmath = True, cache = True)
+    def _jacobi_sweep_numba(src, dst, source):
+        H, W = src.shape
+        ntilesj = (W - 2 + TILE_W - 1)//TILE_W
+        ntiles = (H - 2 + TILE_H - 1)//TILE_H*ntilesj
+        diffsq = 0.
+        newsq = 0.
+        for t in prange(ntiles): # each tile covers internal points i0 <= i < i1, j0 <= j < j1
+            i0 = 1 + t//ntilesj*TILE_H
+            i1 = min(i0 + TILE_H, H - 1)
+            j0 = 1 + t % ntilesj*TILE_W
+            j1 = min(j0 + TILE_W, W - 1)
+            for i in range(i0, i1):
+                for j in range(j0, j1):
+                    new = 0.25*(src[i - 1, j] + src[i + 1, j] + src[i, j - 1] + src[i, j + 1]) + source[i, j]
+                    dst[i, j] = new
+                    diffsq += (new - src[i, j])**2
+                    newsq += new*new
+        return diffsq, newsq
+
+    @njit(fastmath = True, cache = True)
+    def _jacobi_two_step_tile(src, dst, source, i0, i1, j0, j1):
+        H, W = src.shape
+        # the first iteration is needed on the tile and a halo of one point around it,
+        # rows[(i - i0 + 1) % 3, j - j0 + 1] holds it for rows i - 2, i - 1 and i
+        rows = np.empty((3, j1 - j0 + 2), dtype = src.dtype)
+        diffsq = 0.
+        newsq = 0.
+        for i in range(i0 - 1, i1 + 1):
+            row = rows[(i - i0 + 1) % 3]
+            if i == 0 or i == H - 1:
+                for j in range(j0 - 1, j1 + 1):
+                    row[j - j0 + 1] = src[i, j]
+            else:
+                if j0 == 1:
+                    row[0] = src[i, 0]
+                if j1 == W - 1:
+                    row[j1 - j0 + 1] = src[i, W - 1]
+                for j in range(max(j0 - 1, 1), min(j1 + 1, W - 1)):
+                    row[j - j0 + 1] = 0.25*(src[i - 1, j] + src[i + 1, j] + src[i, j - 1] + src[i, j + 1]) + source[i, j]
+            if i > i0: # the first iteration is ready around row i - 1, do the second there
+                up = rows[(i - i0 - 1) % 3]
+                mid = rows[(i - i0) % 3]
+                for j in range(j0, j1):
+                    k = j - j0 + 1
+                    new = 0.25*(up[k] + row[k] + mid[k - 1] + mid[k + 1]) + source[i - 1, j]
+                    dst[i - 1, j] = new
+                    diffsq += (new - src[i - 1, j])**2
+                    newsq += new*new
+        return diffsq, newsq
+
+    @njit(parallel = True, fastmath = True, cache = True)
+    def _jacobi_two_step_numba(src, dst, source):
+        H, W = src.shape
+        ntilesj = (W - 2 + TILE_W - 1)//TILE_W
+        ntiles = (H - 2 + TILE_H - 1)//TILE_H*ntilesj
+        diffsq = 0.
+        newsq = 0.
+        for t in prange(ntiles): # each tile covers internal points i0 <= i < i1, j0 <= j < j1
+            i0 = 1 + t//ntilesj*TILE_H
+            j0 = 1 + t % ntilesj*TILE_W
+            tilediffsq, tilenewsq = _jacobi_two_step_tile(src, dst, source, i0, min(i0 + TILE_H, H - 1), j0, min(j0 + TILE_W, W - 1))
+            diffsq += tilediffsq
+            newsq += tilenewsq
+        return diffsq, newsq
+
+    @njit(parallel = True, fastmath = True, cache = True)
+    def _redblack_sweep_numba(u, source):
+        H, W = u.shape
+        diffsq = 0.
+        newsq = 0.
+        for colour in range(2):
+            for i in prange(1, H - 1):
+                for j in range(1 + (i + 1 + colour) % 2, W - 1, 2):
+                    new = 0.25*(u[i - 1, j] + u[i + 1, j] + u[i, j - 1] + u[i, j + 1]) + source[i, j]
+                    diffsq += (new - u[i, j])**2
+                    newsq += new*new
+                    u[i, j] = new
+        return diffsq, newsq
+
+    @njit(parallel = True, fastmath = True, cache = True)
+    def _redblack_sweep_masked_numba(u, data, source, omega):
+        H, W = u.shape
+        ntilesj = (W - 2 + TILE_W - 1)//TILE_W
+        ntiles = (H - 2 + TILE_H - 1)//TILE_H*ntilesj
+        diffsq = 0.
+        newsq = 0.
+        for colour in range(2):
+            for t in prange(ntiles): # points of one colour do not depend on each other, so neither do the tiles
+                i0 = 1 + t//ntilesj*TILE_H
+                i1 = min(i0 + TILE_H, H - 1)
+                j0 = 1 + t % ntilesj*TILE_W
+                j1 = min(j0 + TILE_W, W - 1)
+                for i in range(i0, i1):
+                    for j in range(j0 + (i + j0 + colour) % 2, j1, 2):
+                        old = u[i, j]
+                        new = old + omega*(0.25*(u[i - 1, j] + u[i + 1, j] + u[i, j - 1] + u[i, j + 1]) + source[i, j] - old)
+                        new = new if data[i, j] >= 0 else old
+                        diffsq += (new - old)**2
+                        newsq += new*new if data[i, j] >= 0 else 0.
+                        u[i, j] = new
+        return diffsq, newsq
+
+def interior_points(data):
+    """
+    interior_points - finds the internal points of a multimesh, so that the sweeps without
+    numba update a list of points instead of testing data at every point of the meshgrid.
+    Only needs to be called again when data changes.
+
+    Input:
+        data : int8 array classifying the points (internal >= 0, fictitious -1, ambient -2)
+
+    Output:
+        ii, jj : row and column indices of the internal points, excluding the outermost points
+    """
+    ii, jj = np.nonzero(data[1:-1, 1:-1] >= 0)
+    return ii + 1, jj + 1
+
+def boundary_points(data):
+    """
+    boundary_points - finds the fictitious and ambient points of a multimesh, so that update_bc
+    only visits these instead of every point of the meshgrid. Only needs to be called again
+    when data changes.
+
+    Input:
+        data : int8 array classifying the points (internal >= 0, fictitious -1, ambient -2)
+
+    Output:
+        fict : (n, 2) array of the indices of the fictitious points
+        dirs : (n, 4) boolean array, True where the fictitious point has an internal point next
+        to it in that direction (right, down, left, up), with a second internal point after it
+        (so materials need to be at least two points thick, as in test_jacobi.py)
+        ambient : (m, 2) array of the indices of the ambient points
+    """
+    H, W = data.shape
+    fict = np.ascontiguousarray(np.argwhere(data == -1)) # C order, read by the C kernel without a copy
+    ambient = np.ascontiguousarray(np.argwhere(data == -2))
+    dirs = np.zeros((fict.shape[0], 4), dtype = np.bool_)
+    for d in range(4):
+        i1, j1 = fict[:, 0] + _DI[d], fict[:, 1] + _DJ[d]
+        i2, j2 = fict[:, 0] + 2*_DI[d], fict[:, 1] + 2*_DJ[d]
+        ongrid = (i2 >= 0) & (i2 < H) & (j2 >= 0) & (j2 < W)
+        # Locating internal point direction. The point after it must be internal too, so that
+        # update_bc only reads internal points and can write its result in place
+        dirs[ongrid, d] = (data[i1[ongrid], j1[ongrid]] >= 0) & (data[i2[ongrid], j2[ongrid]] >= 0)
+    return fict, dirs, ambient
+
+def update_bc(meshval, kmap, fict, dirs, ambient, step, natural, hforced, out = None):
+    """
+    update_bc - calculates the fictitious points of a multimesh from the internal points next
+    to them, and resets the ambient points to Ta = 20 deg C. Each fictitious point is the
+    average of the values given by each neighbouring internal point. Uses the C kernel in
+    heat_kernels.so if it has been compiled, a compiled loop over the fictitious points if
+    numba is available, and vectorised numpy otherwise.
+
+    Inputs:
+        meshval : meshgrid values
+        kmap : array of the same shape as meshval with the thermal conductivity of the material
+        at each internal point, read directly instead of looking up the material of the point
+        fict, dirs, ambient : fictitious and ambient points, as given by boundary_points(data)
+        step : spacing between two mesh points
+        natural : True for natural convection, False for forced convection
+        hforced : heat transfer coefficient used for forced convection, negative so that
+        the fictitious point (the point two steps inside plus 2*h*step*(T - Ta)/k) lets heat out
+        out : optional array of the same shape as meshval to write the result to, so that no new
+        array is allocated. May be meshval itself, as only the internal points are read (see
+        boundary_points).
+
+    Output:
+        meshvalnew : copy of meshval with updated fictitious and ambient points (out if given)
+    """
+    if out is None:
+        out = meshval.copy()
+    elif out is not meshval:
+        np.copyto(out, meshval)
+    if _use_c(meshval, out, meshval) and meshval.dtype == np.float64: # meshval stands in for the source term
+        _update_bc_c(meshval, out, kmap, fict, dirs, ambient, step, natural, hforced)
+    elif USE_NUMBA:
+        _update_bc_numba(meshval, out, kmap, fict, dirs, ambient, step, natural, hforced)
+    else:
+        _update_bc_numpy(meshval, out, kmap, fict, dirs, ambient, step, natural, hforced)
+    return out
+
+def jacobi_sweep(src, dst, source, scratch = None, norms = True):
+    """
+    jacobi_sweep - one iteration of the Jacobi method with the 5-point pictorial operator.
+    Only the internal points of dst are written, the outermost points are left unchanged.
+    Uses the C kernel in heat_kernels.so if it has been compiled, numba or numpy otherwise.
+
+    Inputs:
+        src : meshgrid values from the previous iteration
+        dst : array of the same shape as src (C-contiguous) to store the updated values
+        source : array of the same shape as src (may be a broadcast view) with step**2*(q/k)/4
+        at every point
+        scratch : optional array of the same shape as src, used for dst - src without numba
+        so that it can be allocated once outside the iteration loop
+        norms : if False, the sums are not needed (only computed when convergence is checked)
+
+    Output:
+        diffsq, newsq : sums over the internal points of (dst - src)**2 and dst**2, computed
+        in the same pass so that convergence can be checked without going over the arrays again.
+        None if norms is False.
+    """
+    if _use_c(src, dst, source):
+        sums = _jacobi_sweep_c(src, dst, source, norms)
+    elif USE_NUMBA:
+        sums = _jacobi_sweep_numba(src, dst, source) # the sums cost little in the same loop
+    elif norms:
+        sums = _jacobi_sweep_numpy(src, dst, source, np.empty_like(src) if scratch is None else scratch)
+    else:
+        _jacobi_update_numpy(src, dst, source)
+    return sums if norms else None
+
+def jacobi_sweep_masked(src, dst, data, source, interior = None, norms = True):
+    """
+    jacobi_sweep_masked - one iteration of the Jacobi method with the 5-point pictorial
+    operator over the internal points of a multimesh only (data >= 0). The fictitious and
+    ambient points inside the grid keep their values, as do the outermost points. Uses the C
+    kernel in heat_kernels.so if it has been compiled. With numba, the meshgrid is split into
+    tiles of TILE_H x TILE_W points as in jacobi_sweep.
+
+    Inputs:
+        src : meshgrid values from the previous iteration
+        dst : array of the same shape as src to store the updated values, which must have the
+        same values as src at the points that are not updated
+        data : int8 array classifying the points (internal >= 0, fictitious -1, ambient -2)
+        source : array of the same shape as src with step**2*(q/k)/4 of the material at each point
+        interior : optional indices of the internal points as given by interior_points(data),
+        used without numba so that they can be found once outside the iteration loop
+        norms : if False, the sums are not needed
+
+    Output:
+        diffsq, newsq : sums over the internal points (data >= 0) of (dst - src)**2 and dst**2,
+        None if norms is False
+    """
+    if _use_c_masked(src, dst, data, source):
+        sums = _jacobi_sweep_masked_c(src, dst, data, source, norms)
+    elif USE_NUMBA:
+        sums = _jacobi_sweep_masked_numba(src, dst, data, source)
+    else:
+        sums = _jacobi_sweep_masked_numpy(src, dst, interior_points(data) if interior is None else interior, source, norms)
+    return sums if norms else None
+
+def jacobi_stencil(src, dst, source, scratch = None, norms = True):
+    """
+    jacobi_stencil - one iteration of the Jacobi method, same as jacobi_sweep, but with the
+    loops over the meshgrid generated by numba from the 5-point pictorial operator
+    (numba.stencil) instead of being written out by hand.
+
+    Inputs:
+        src : meshgrid values from the previous iteration
+        dst : array of the same shape as src to store the updated values
+        source : array of the same shape as src (may be a broadcast view) with step**2*(q/k)/4
+        at every point
+        scratch : optional array of the same shape as src, used for dst - src without numba
+        norms : if False, the sums are not needed
+
+    Output:
+        diffsq, newsq : sums over the internal points of (dst - src)**2 and dst**2,
+        None if norms is False
+    """
+    if USE_NUMBA:
+        sums = _jacobi_stencil_numba(src, dst, source)
+    elif norms:
+        sums = _jacobi_sweep_numpy(src, dst, source, np.empty_like(src) if scratch is None else scratch)
+    else:
+        _jacobi_update_numpy(src, dst, source)
+    return sums if norms else None
+
+def jacobi_two_step(src, dst, tmp, source, norms = True):
+    """
+    jacobi_two_step - two iterations of the Jacobi method fused into one pass over the
+    meshgrid. With numba, the meshgrid is split into tiles of TILE_H x TILE_W points which
+    are done in parallel. In each tile the first iteration is kept in a register of three
+    rows, so src is only read once and dst only written once for both iterations. Uses the
+    same fused kernel in heat_kernels.so if it has been compiled.
+
+    Inputs:
+        src : meshgrid values from the previous iteration
+        dst : array of the same shape as src (C-contiguous) to store the values after two iterations
+        tmp : array with the same outermost points as src, used for the first iteration (and then
+        for dst - src) without numba
+        source : array of the same shape as src (may be a broadcast view) with step**2*(q/k)/4
+        at every point
+        norms : if False, the sums are not needed
+
+    Output:
+        diffsq, newsq : sums over the internal points of (dst - src)**2 and dst**2,
+        None if norms is False
+    """
+    if _use_c(src, dst, source):
+        sums = _jacobi_two_step_c(src, dst, source, norms)
+    elif USE_NUMBA:
+        sums = _jacobi_two_step_numba(src, dst, source)
+    elif norms:
+        sums = _jacobi_two_step_numpy(src, dst, tmp, source)
+    else:
+        _jacobi_update_numpy(src, tmp, source)
+        _jacobi_update_numpy(tmp, dst, source)
+    return sums if norms else None
+
+def redblack_sweep(u, source, norms = True):
+    """
+    redblack_sweep - one iteration of the red-black Gauss-Seidel method, done in place.
+    Internal points with (i + j) even are updated first, then those with (i + j) odd using
+    the new values. Points of the same colour do not depend on each other, so each half
+    is a single vectorised (or parallel) update.
+
+    Inputs:
+        u : meshgrid values, updated in place (outermost points are left unchanged)
+        source : array of the same shape as u (may be a broadcast view) with step**2*(q/k)/4
+        at every point
+        norms : if False, the sums are not needed
+
+    Output:
+        diffsq, newsq : sums over the internal points of the squared change and of the
+        squared new values, None if norms is False
+    """
+    if USE_NUMBA:
+        sums = _redblack_sweep_numba(u, source)
+    else:
+        sums = _redblack_sweep_numpy(u, source, norms)
+    return sums if norms else None
+
+def redblack_sweep_masked(u, data, source, omega = 1., norms = True):
+    """
+    redblack_sweep_masked - one iteration of the red-black Gauss-Seidel method with successive
+    over-relaxation over the internal points of a multimesh only (data >= 0), done in place.
+    Each point is moved omega times the Gauss-Seidel change, u + omega*(gs(u) - u); omega = 1
+    is plain Gauss-Seidel and 1 < omega < 2 converges in fewer iterations. Uses the C kernel
+    in heat_kernels.so if it has been compiled. With numba, each colour is done in parallel
+    over tiles of TILE_H x TILE_W points.
+
+    Inputs:
+        u : meshgrid values, updated in place (points with data < 0 and the outermost points
+        are left unchanged)
+        data : int8 array classifying the points (internal >= 0, fictitious -1, ambient -2)
+        source : array of the same shape as u with step**2*(q/k)/4 of the material at each point
+        omega : relaxation factor
+        norms : if False, the sums are not needed
+
+    Output:
+        diffsq, newsq : sums over the internal points (data >= 0) of the squared change and
+        of the squared new values, None if norms is False
+    """
+    if _use_c_masked(u, u, data, source):
+        sums = _redblack_sweep_masked_c(u, data, source, omega, norms)
+    elif USE_NUMBA:
+        sums = _redblack_sweep_masked_numba(u, data, source, omega)
+    else:
+        sums = _redblack_sweep_masked_numpy(u, data, source, omega, norms)
+    return sums if norms else None
@@ -1,4 +1,9 @@
 import numpy as np
+from jacobi_kernel import jacobi_stencil, jacobi_sweep, jacobi_two_step, redblack_sweep
+
+DTYPE = np.float32 # storage type of the meshgrid values, halves the memory traffic compared to float64
+HFORCED = -(11.4 + 5.7*20)*1e-6 # heat transfer coefficient for forced convection, negative as in multimesh
+CHECK_EVERY = 16 # number of iterations between two convergence checks
 
 class meshgrid:
     """
@@ -28,7 +33,7 @@ class meshgrid:
         Data attributes:
             self.xpts : the coordinates along the x-axis of the points on the grid
             self.ypts : the coordinates along the y-axis of the points on the grid
-            self.meshval : a zero matrix of the size of xpts*ypts, used for storing values
+            self.meshval : a matrix of the size of xpts*ypts filled with Tguess, used for storing values
             solved in the differential equation
             self.data : a matrix of the same size as self.meshval to classify whether
             the point is an internal point (value = data), a fictitious point (value = 1) or an ambient point (value = 0).
@@ -39,16 +44,16 @@ class meshgrid:
             self.xpts = np.arange(xstart, xstop, step)
             self.ypts = np.arange(ystart, ystop, step)
             if wfict == True:
-                self.meshval = np.zeros([self.ypts.size + 2, self.xpts.size + 2])
-                self.data = np.zeros([self.ypts.size + 2, self.xpts.size + 2])
+                self.meshval = np.full([self.ypts.size + 2, self.xpts.size + 2], Tguess, dtype = DTYPE) # fictitious points are set by updatebc
+                self.data = np.zeros([self.ypts.size + 2, self.xpts.size + 2], dtype = np.int8)
                 self.data[1:-1, 1:-1] = data
                 self.data[0, :] = -1 # fictitious point
                 self.data[-1, :] = -1
                 self.data[:, 0] = -1
                 self.data[:, -1] = -1
             else:
-                self.meshval = np.zeros([self.ypts.size, self.xpts.size])
-                self.data = np.zeros([self.ypts.size, self.xpts.size])
+                self.meshval = np.full([self.ypts.size, self.xpts.size], Tguess, dtype = DTYPE)
+                self.data = np.zeros([self.ypts.size, self.xpts.size], dtype = np.int8)
                 self.data[:, :] = data
             self.datanum = data
             self.step = step
@@ -58,60 +63,247 @@ class meshgrid:
             self.wfict = wfict
         else:
             raise ValueError("Input 'data' must be an integer >= 2.")
+    
+    def shift_x(self, dx):
+        """
+        shift_x - moves the meshgrid along the x-axis, in place of creating a new meshgrid
+        at the shifted coordinates (meshval and data do not change)
+        
+        Input:
+            dx : distance to move by, REQUIRE a multiple of step
+        
+        Output:
+            self : the shifted meshgrid
+        """
+        n = dx/self.step
+        if abs(n - round(n)) > 1e-9:
+            raise ValueError("Require dx to be a multiple of step.")
+        # recalculated from the grid indices, so that rounding errors do not add up over several shifts
+        self.xpts = (round(self.xpts[0]/self.step) + round(n) + np.arange(self.xpts.size))*self.step
+        return self
             
     def Jacobi(self):
         """
         Jacobi - Jacobi method with pictoral operator operation over all grid points
         This takes all points (excluding fictitious) and operate on them using the pictorial
-        operator (form depends on the order).
+        operator (form depends on the order), given to numba as a stencil by jacobi_stencil.
         
         Output:
             meshvalnew : updated meshgrid after iterating until convergence
         """
-        meshvalnew = np.zeros_like(self.meshval)
+        meshval = self.meshval.copy()
+        meshvalnew = self.meshval.copy() # keep the fictitious points as they are
+        scratch = np.empty_like(meshval) # reused by every iteration instead of allocating temporaries
+        source = np.broadcast_to(np.asarray(self.step**2*(self.q/self.k)/4, dtype = meshval.dtype), meshval.shape) # same at every point
         deltax = 1.
-        while deltax >= 1e-14:
-            for i in np.arange(1, self.meshval.shape[0] - 1):
-                for j in np.arange(1, self.meshval.shape[1] - 1):
-                    meshvalnew[i, j] = 1/4*(self.meshval[i - 1, j] + self.meshval[i + 1, j]
-                    + self.meshval[i, j - 1] + self.meshval[i, j + 1])
-                    - self.step**2 * (-self.q/self.k)/4
-            deltax = np.abs(np.linalg.norm(meshvalnew[1:-1, 1:-1]) - np.linalg.norm(self.meshval[1:-1, 1:-1]))/np.linalg.norm(self.meshval[1:-1, 1:-1]) # only take internal point temperatures and compare
-            self.meshval = meshvalnew.copy()
+        tol = max(1e-8, np.finfo(meshval.dtype).eps) # float32 values cannot converge further than eps
+        count = 0
+        while deltax >= tol:
+            count += 1
+            if count % CHECK_EVERY == 0: # the sums are only computed when convergence is checked
+                diffsq, newsq = jacobi_stencil(meshval, meshvalnew, source, scratch)
+                deltax = np.sqrt(diffsq/newsq) # only take internal point temperatures and compare
+            else:
+                jacobi_stencil(meshval, meshvalnew, source, scratch, norms = False)
+            meshval, meshvalnew = meshvalnew, meshval # swap the buffers instead of copying
+        self.meshval = meshval
         #meshvalnew = meshvalnew[::-1] # Flip around the vertical direction
-        return meshvalnew
+        return meshval
     
     def Jacobiroll(self):
         """
         Jacobiroll - Jacobi method with pictorial operator represented by 'rolling'
-        the values in the meshgrid.
+        the values in the meshgrid. Two iterations are done at a time by jacobi_two_step,
+        which uses a compiled numba kernel if numba is available and shifted slices otherwise.
+        Convergence is checked between the values before and after the two iterations,
+        every CHECK_EVERY passes.
         
         Output:
             meshvalnew : updated meshgrid after iterating until convergence
         """
         deltax = 1.
         meshval = self.meshval.copy()
-        while deltax >= 1e-14:
-            rolldown = np.roll(meshval, 1, axis = 0)
-            rolldown = rolldown[1:-1, 1:-1] # extract only the internal points
-            rollup = np.roll(meshval, -1, axis = 0)
-            rollup = rollup[1:-1, 1:-1]
-            rollright = np.roll(meshval, 1, axis = 1)
-            rollright = rollright[1:-1, 1:-1]
-            rollleft = np.roll(meshval, -1, axis = 1)
-            rollleft = rollleft[1:-1, 1:-1]
-            meshvalnew = meshval.copy()
-            meshvalnew[1:-1, 1:-1] = (rolldown + rollup + rollright + rollleft)/4
-            meshvalnew[1:-1, 1:-1] += self.step**2*(self.q/self.k)/4
-            deltax = np.abs(np.linalg.norm(meshvalnew[1:-1, 1:-1]) - np.linalg.norm(meshval[1:-1, 1:-1]))/np.linalg.norm(meshval[1:-1, 1:-1]) # only take internal point temperatures and compare
-            meshval = meshvalnew.copy()
-        self.meshval = meshvalnew.copy() # only change the values in the meshgrid object AFTER finish iterating
+        meshvalnew = self.meshval.copy() # fictitious points are copied once and never change
+        meshvaltmp = self.meshval.copy() # values after the first of the two iterations
+        source = np.broadcast_to(np.asarray(self.step**2*(self.q/self.k)/4, dtype = meshval.dtype), meshval.shape) # same at every point
+        tol = max(1e-8, np.finfo(meshval.dtype).eps) # float32 values cannot converge further than eps
+        count = 0
+        while deltax >= tol:
+            count += 1
+            if count % CHECK_EVERY == 0: # the sums are only computed when convergence is checked
+                diffsq, newsq = jacobi_two_step(meshval, meshvalnew, meshvaltmp, source)
+                deltax = np.sqrt(diffsq/newsq) # only take internal point temperatures and compare
+            else:
+                jacobi_two_step(meshval, meshvalnew, meshvaltmp, source, norms = False)
+            meshval, meshvalnew = meshvalnew, meshval # swap the buffers instead of copying
+        self.meshval = meshval # only change the values in the meshgrid object AFTER finish iterating
         return self
     
+    def Jacobi_chebyshev(self, n_iters):
+        """
+        Jacobi_chebyshev - Jacobi method with Chebyshev acceleration. Each iteration takes a
+        Jacobi sweep of the current values and extrapolates from the values two iterations
+        before, u_new = u_prev + omega*(jacobi(u) - u_prev), with omega given by the Chebyshev
+        recurrence for the spectral radius rho of the Jacobi iteration. rho is known for the
+        5-point pictorial operator on a rectangle, so no eigenvalues have to be estimated.
+        This needs about sqrt of the number of iterations of the Jacobi method.
+        
+        Inputs:
+            n_iters : maximum number of iterations, stops earlier if converged
+        
+        Output:
+            meshval : updated meshgrid after iterating
+        """
+        deltax = 1.
+        meshvalprev = self.meshval.astype(np.float64) # the extrapolation amplifies float32 rounding errors
+        meshval = meshvalprev.copy()
+        meshvalnew = meshvalprev.copy() # fictitious points are copied once and never change
+        scratch = np.empty_like(meshval) # reused by every iteration instead of allocating temporaries
+        source = np.broadcast_to(self.step**2*(self.q/self.k)/4, meshval.shape) # same at every point
+        tol = max(1e-8, np.finfo(self.meshval.dtype).eps) # float32 values cannot converge further than eps
+        rho = (np.cos(np.pi/(meshval.shape[0] - 1)) + np.cos(np.pi/(meshval.shape[1] - 1)))/2
+        omega = 1.
+        n = 0
+        while deltax >= tol and n < n_iters:
+            jacobi_sweep(meshval, meshvalnew, source, scratch, norms = False)
+            interior = meshvalnew[1:-1, 1:-1]
+            np.subtract(interior, meshvalprev[1:-1, 1:-1], out = interior)
+            np.multiply(interior, omega, out = interior)
+            np.add(interior, meshvalprev[1:-1, 1:-1], out = interior)
+            if (n + 1) % CHECK_EVERY == 0:
+                diff = np.subtract(interior, meshval[1:-1, 1:-1], out = scratch[1:-1, 1:-1])
+                deltax = np.linalg.norm(diff)/np.linalg.norm(meshval[1:-1, 1:-1]) # only take internal point temperatures and compare
+            omega = 1/(1 - rho**2/2) if n == 0 else 1/(1 - rho**2*omega/4)
+            meshvalprev, meshval, meshvalnew = meshval, meshvalnew, meshvalprev # rotate the buffers instead of copying
+            n += 1
+        self.meshval = meshval.astype(self.meshval.dtype) # only change the values in the meshgrid object AFTER finish iterating
+        return self
+
+    def _residual(self, u, f, step):
+        """
+        _residual - residual r = f - A u of the discretised Poisson's equation, where A u is
+        the 5-point pictorial operator (4u - sum of neighbours)/step^2 and f = q/k.
+
+        Inputs:
+            u : values on the grid, the outer layer is kept fixed
+            f : right hand side at each point (same shape as u)
+            step : spacing between two grid points
+
+        Output:
+            r : residual at each internal point, zero on the outer layer
+        """
+        r = np.zeros_like(u)
+        r[1:-1, 1:-1] = f[1:-1, 1:-1] - (4*u[1:-1, 1:-1] - u[:-2, 1:-1] - u[2:, 1:-1] - u[1:-1, :-2] - u[1:-1, 2:])/step**2
+        return r
+
+    def _weights(self, n, nc):
+        """
+        _weights - linear interpolation between nc and n equally spaced points covering the
+        same length (the first and last points coincide).
+
+        Output:
+            i, w : point p of the n points lies between points i[p] and i[p] + 1 of the
+            nc points, a fraction w[p] of the way
+        """
+        s = np.arange(n)*(nc - 1)/(n - 1)
+        i = np.minimum(s.astype(int), nc - 2)
+        return i, s - i
+
+    def _restrict(self, r):
+        """
+        _restrict - full weighting restriction of the residual onto the coarse grid, which has
+        about half the number of points in each direction. For an odd number of points the
+        coarse points lie on every other fine point and the weights are the usual 1/4, 1/2, 1/4
+        in each direction; otherwise the transpose of the linear interpolation is used so that
+        the boundaries of the two grids stay at the same place.
+
+        Inputs:
+            r : residual on the fine grid
+
+        Output:
+            rc : residual on the coarse grid
+        """
+        rc = r
+        for nc in ((r.shape[0] + 2)//2, (r.shape[1] + 2)//2):
+            i, w = self._weights(rc.shape[0], nc)
+            rsum = np.zeros([nc, rc.shape[1]])
+            np.add.at(rsum, i, (1 - w)[:, None]*rc)
+            np.add.at(rsum, i + 1, w[:, None]*rc)
+            rc = (rsum/(np.bincount(i, 1 - w, nc) + np.bincount(i + 1, w, nc))[:, None]).T # next direction
+        return rc.astype(r.dtype)
+
+    def _prolongate(self, ec, shape):
+        """
+        _prolongate - bilinear interpolation of the coarse grid correction onto the fine grid.
+
+        Inputs:
+            ec : correction on the coarse grid, zero on the outer layer
+            shape : shape of the fine grid
+
+        Output:
+            e : correction on the fine grid
+        """
+        e = ec
+        for n in shape:
+            i, w = self._weights(n, e.shape[0])
+            e = ((1 - w)[:, None]*e[i] + w[:, None]*e[i + 1]).T # next direction
+        return e.astype(ec.dtype)
+
+    def _vcycle(self, u, f, step, nsmooth = 3):
+        """
+        _vcycle - one multigrid V-cycle on A u = f, updating the internal points of u in place.
+        The error is smoothed by red-black Gauss-Seidel sweeps, and the remaining smooth error
+        is solved for recursively on a grid with twice the spacing.
+
+        Inputs:
+            u : values on the grid, the outer layer gives the boundary conditions
+            f : right hand side at each point (same shape as u)
+            step : spacing between two grid points
+            nsmooth : number of sweeps before and after the coarse grid correction
+        """
+        source = step**2*f/4 # form taken by the sweep kernels
+        if min(u.shape) < 5: # too few internal points to coarsen, sweep until converged
+            for n in range(1000):
+                diffsq, newsq = redblack_sweep(u, source)
+                if diffsq <= np.finfo(u.dtype).eps**2*newsq:
+                    break
+            return
+        for n in range(nsmooth):
+            redblack_sweep(u, source)
+        rc = self._restrict(self._residual(u, f, step))
+        ec = np.zeros_like(rc) # error is zero on the boundary
+        stepy = step*(u.shape[0] - 1)/(rc.shape[0] - 1)
+        stepx = step*(u.shape[1] - 1)/(rc.shape[1] - 1)
+        self._vcycle(ec, rc, np.sqrt(2/(1/stepx**2 + 1/stepy**2)), nsmooth) # about twice the spacing
+        u[1:-1, 1:-1] += self._prolongate(ec, u.shape)[1:-1, 1:-1]
+        for n in range(nsmooth):
+            redblack_sweep(u, source)
+
+    def Multigrid(self):
+        """
+        Multigrid - solves the Poisson's equation with the fictitious points kept fixed using
+        multigrid V-cycles, which can be used in place of Jacobiroll. The number of V-cycles
+        needed does not grow with the number of points, unlike the Jacobi method.
+
+        Output:
+            meshval : updated meshgrid after iterating until convergence
+        """
+        deltax = 1.
+        meshval = self.meshval.astype(np.float64) # a float32 residual is dominated by rounding errors
+        f = np.full(meshval.shape, self.q/self.k) # same at every point
+        tol = max(1e-8, np.finfo(self.meshval.dtype).eps) # float32 values cannot converge further than eps
+        while deltax >= tol:
+            meshvalold = meshval[1:-1, 1:-1].copy()
+            self._vcycle(meshval, f, self.step)
+            deltax = np.linalg.norm(meshval[1:-1, 1:-1] - meshvalold)/np.linalg.norm(meshvalold) # only take internal point temperatures and compare
+        self.meshval = meshval.astype(self.meshval.dtype) # only change the values in the meshgrid object AFTER finish iterating
+        return self
+
     def updatebc(self, mode = "natural"):
         """
         updatebc - updates the meshgrid fictitious point values using values calculated
-        from one successful iteration of the Jacobi method.
+        from one successful iteration of the Jacobi method. h is negative, so that the
+        fictitious point (the point two steps inside plus 2*h*step*(T - Ta)/k) lets heat out.
         
         Inputs:
             mode : "natural" or "forced" convection
@@ -120,31 +312,22 @@ class meshgrid:
             meshvalnew : values on meshgrid with updated boundary values
         """
         meshvalnew = self.meshval.copy()
-        for i in np.arange(1, self.meshval.shape[0] - 1):
-            if mode == "natural":
-                h1 = 1.31e-6*np.cbrt(self.meshval[i, 1] - (20+273))
-                h2 = 1.31e-6*np.cbrt(self.meshval[i, -2] - (20+273))
-            if mode == "forced":
-                h1 = (11.4 + 5.7*20)*1e-6
-                h2 = (11.4 + 5.7*20)*1e-6
-            meshvalnew[i, 0] = 2*h1*self.step*(self.meshval[i, 1]-(20.+273.))/self.k + self.meshval[i, 2]
-            meshvalnew[i, -1] = 2*h2*self.step*(self.meshval[i, -2]-(20.+273.))/self.k + self.meshval[i, -3]
-        for j in np.arange(1, self.meshval.shape[1] - 1):
-            if mode == "natural":
-                h3 = 1.31e-6*np.cbrt(self.meshval[1, j] - (20+273))
-                h4 = 1.31e-6*np.cbrt(self.meshval[-2, j] - (20+273))
-            if mode == "forced":
-                h3 = (11.4 + 5.7*20)*1e-6
-                h4 = (11.4 + 5.7*20)*1e-6
-            meshvalnew[0, j] = 2*h3*self.step*(self.meshval[1, j]-(20.+273.))/self.k + self.meshval[2, j]
-            meshvalnew[-1, j] = 2*h4*self.step*(self.meshval[-2, j]-(20.+273.))/self.k + self.meshval[-3, j]
-        self.meshval = meshvalnew.copy()
+        if mode == "natural":
+            h = lambda T: -1.31e-6*np.cbrt(T - (20+273)) # evaluated for a whole side at once, negative like HFORCED
+        if mode == "forced":
+            h = lambda T: HFORCED
+        # each side (excluding the corners) is calculated from the first two rows / columns of internal points
+        meshvalnew[1:-1, 0] = 2*h(self.meshval[1:-1, 1])*self.step*(self.meshval[1:-1, 1]-(20.+273.))/self.k + self.meshval[1:-1, 2]
+        meshvalnew[1:-1, -1] = 2*h(self.meshval[1:-1, -2])*self.step*(self.meshval[1:-1, -2]-(20.+273.))/self.k + self.meshval[1:-1, -3]
+        meshvalnew[0, 1:-1] = 2*h(self.meshval[1, 1:-1])*self.step*(self.meshval[1, 1:-1]-(20.+273.))/self.k + self.meshval[2, 1:-1]
+        meshvalnew[-1, 1:-1] = 2*h(self.meshval[-2, 1:-1])*self.step*(self.meshval[-2, 1:-1]-(20.+273.))/self.k + self.meshval[-3, 1:-1]
+        self.meshval = meshvalnew
         return meshvalnew
 
     def iterateJacobi(self):
         """
         iterateJacobi - Iterative method to determine temperature in the meshgrid until stabilise.
-        This method uses the Jacobi method to repeatedly obtain updated values
+        This method uses multigrid V-cycles (Multigrid) to repeatedly obtain updated values
         of surface temperatures through solving the Poisson's equation until the surface
         temperatures are stabilised.
             
@@ -153,21 +336,20 @@ class meshgrid:
         """
         # Initialise the meshgrid with Tguess on all points on the microprocessor 
         # and values on boundaries calculated through temperatures of the internal points
-        for i in np.arange(1, self.meshval.shape[0] - 1):
-            for j in np.arange(1, self.meshval.shape[1] - 1):
-                self.meshval[i, j] = self.Tguess
-        meshval = self.updatebc()
+        self.meshval[1:-1, 1:-1] = self.Tguess
+        norm = np.linalg.norm(self.updatebc()[1:-1, 1:-1]) # only take internal point temperatures and compare
         deltax = 1
         deltadeltax = 0
         count = 1
         while deltadeltax <= 0 or count == 2 or count == 3:
-            self.Jacobiroll()
+            self.Multigrid()
             meshvalnew = self.updatebc()
-            deltaxnew = np.abs(np.linalg.norm(meshvalnew[1:-1, 1:-1]) - np.linalg.norm(meshval[1:-1, 1:-1]))/np.linalg.norm(meshval[1:-1, 1:-1]) # only take internal point temperatures and compare
+            normnew = np.linalg.norm(meshvalnew[1:-1, 1:-1])
+            deltaxnew = np.abs(normnew - norm)/norm
             deltadeltax = deltaxnew - deltax
-            meshval = meshvalnew.copy()
+            norm = normnew # reused in the next iteration instead of going over the meshgrid again
             print("deltax =", deltaxnew, "deltadeltax =", deltadeltax, "count =", count)
             count += 1
-            deltax = deltaxnew.copy()
-        self.meshval = meshvalnew.copy() # only change the values in the meshgrid object AFTER finish iterating
+            deltax = deltaxnew
+        self.meshval = meshvalnew # only change the values in the meshgrid object AFTER finish iterating
         return self
@@ -1,4 +1,13 @@
 import numpy as np
+from jacobi_kernel import boundary_points, interior_points, jacobi_sweep_masked, redblack_sweep_masked, update_bc
+
+HFORCED = -(11.4 + 5.7*20)*1e-3 # heat transfer coefficient for forced convection
+CHECK_EVERY = 16 # number of iterations between two convergence checks
+CORRECT_EVERY = 256 # number of iterations between two corrections of the overall temperature level
+RTOL = 1e-10 # largest residual relative to the largest temperature rise (at least 1 K) when iterate stops
+MAX_ITER = 2*10**6 # number of iterations after which iterate gives up
+OMEGA = 1.7 # relaxation factor of iterateRedBlackSOR
+JACOBI_WEIGHT = 0.9 # weight of the Jacobi method in iterateJacobi
 
 class multimesh:
     """
@@ -16,11 +25,22 @@ class multimesh:
             self.step : step size of the grid
             self.xpts : the coordinates along the x-axis of the points on the grid
             self.ypts : the coordinates along the y-axis of the points on the grid
-            self.meshval : a zero matrix of the size of xpts*ypts, used for storing values
-            solved in the differential equation
+            self.meshval : a matrix of the size of xpts*ypts, used for storing values
+            solved in the differential equation, initially Tguess at the internal points and Ta elsewhere.
+            Stored as float64 whatever the dtype of the meshgrids, as iterate needs residuals far
+            below the rounding errors of float32.
             self.data : a matrix of the same size as self.meshval to classify whether
             the point is an internal point (value = data), a fictitious point (value = -1) or an ambient point (value = -2).
             self.values : an array that stores values of k, q, and Tguess for the meshgrids with row number = 'datanum'
+            self.idx : integer array of the xstart, xend, ystart, yend indices of the meshgrids, row number = 'datanum'
+            self.fictpts, self.fictdirs, self.ambientpts : indices of the fictitious points, directions of
+            their internal points and indices of the ambient points (see jacobi_kernel.boundary_points)
+            self.intpts : row and column indices of the internal points (see jacobi_kernel.interior_points)
+            self.source : step**2*(q/k)/4 of the material at each internal point (0 elsewhere), the
+            source term of the sweeps, calculated once here instead of in every call to them
+            self.kmap : k of the material at each internal point (1 elsewhere), read by updatebc
+            self.meshvalspare : array of the same shape as self.meshval that Jacobiroll writes the new
+            values to, swapped with self.meshval after each call so that no new array is allocated
         """
         if obj1.xpts[0] > obj2.xpts[0]: # Select which starting point is smaller
             xstartnew = round(obj2.xpts[0], 1)
@@ -44,7 +64,7 @@ class multimesh:
             raise ValueError("Require step size of both meshgrids to be the same.")
         self.xpts = np.arange(xstartnew, xstopnew, self.step)
         self.ypts = np.arange(ystartnew, ystopnew, self.step)
-        self.data = np.zeros([ystopnew/self.step + 2, xstopnew/self.step + 2])
+        self.data = np.zeros([int(round(ystopnew/self.step)) + 2, int(round(xstopnew/self.step)) + 2], dtype = np.int8)
         # first set up every point to be ambient points, then modify using cooedinates of objects
         self.data[:, :] = -2
         xselfstart = round(obj1.xpts[0]/obj1.step)
@@ -85,199 +105,186 @@ class multimesh:
         self.values[obj2.datanum, 6] = round(obj2.ypts[-1]/self.step)
         
         # now set up meshgrid
-        self.meshval = np.zeros_like(self.data)
-        T1 = np.where(self.data == -2)
+        self.meshval = np.full(self.data.shape, 20. + 273.) # set temperature of ambient points to Ta = 20 deg C
         T2 = np.where(self.data == obj1.datanum)
         T3 = np.where(self.data == obj2.datanum)
         
-        self.meshval(T1) = 20. + 273.
-        self.meshval(T2) = obj1.Tguess
-        self.meshval(T3) = obj2.Tguess
-        
-        
-        for i in np.arange(self.meshval.shape[0]):
-            for j in np.arange(self.meshval.shape[1]):
-                if self.data[i, j] == -2:
-                    self.meshval[i, j] = 20. + 273. # set temperature of ambient points to Ta = 20 deg C
-                elif self.data[i, j] == obj1.datanum: # internal point
-                    self.meshval[i, j] = obj1.Tguess
-                elif self.data[i, j] == obj2.datanum:
-                    self.meshval[i, j] = obj2.Tguess
+        self.meshval[T2] = obj1.Tguess # internal points
+        self.meshval[T3] = obj2.Tguess
+        self._update_derived()
+    
+    def _update_derived(self):
+        """
+        _update_derived - sets up the attributes calculated from data, values and meshval
+        (idx, meshvalspare, fictpts, fictdirs, ambientpts, intpts, source and kmap, see __init__).
+        Called whenever these change, so that the iterations do not recalculate them.
+        """
+        self.idx = self.values[:, 3:7].astype(np.intp) # used for slicing, so converted once here
+        self.meshvalspare = np.empty_like(self.meshval)
+        self.fictpts, self.fictdirs, self.ambientpts = boundary_points(self.data)
+        self.intpts = interior_points(self.data)
+        qk = self.values[:, 1]/self.values[:, 0] # q/k of each material, indexed by data
+        self.source = np.where(self.data >= 0, self.step**2*qk[np.maximum(self.data, 0)]/4, 0.) # float64 like meshval
+        self.kmap = np.where(self.data >= 0, self.values[np.maximum(self.data, 0), 0], 1.)
                     
-    def combine(self, other):
+    def combine(self, *others):
         """
-        combine - Combines a multimesh object to a third meshgrid object along the y-direction
+        combine - Combines a multimesh object to one or more meshgrid objects along the y-direction.
+        The new meshgrid is allocated once for all of them, so e.g. the fins of a heat sink
+        should be combined in one call.
         
         Input:
-            other : meshgrid object to be combined into a multimesh
+            others : meshgrid objects to be combined into a multimesh
+            REQUIRE same step size, and the meshgrids do not overlap each other.
         Output:
-            Updates attributes of current multimesh to include the object 'other'
+            Updates attributes of current multimesh to include the objects in 'others'
         """
-        if self.xpts[0] > other.xpts[0]: # Select which starting point is smaller
-            xstartnew = round(other.xpts[0], 1)
-        else:
-            xstartnew = round(self.xpts[0], 1)
-        if self.ypts[0] > other.ypts[0]:
-            ystartnew = round(other.ypts[0], 1)
-        else:
-            ystartnew = round(self.ypts[0], 1)
-        if self.xpts[-1] >= other.xpts[-1]:
-            xstopnew = round(self.xpts[-1] + self.step, 1)
-        else:
-            xstopnew = round(other.xpts[-1] + self.step, 1)
-        if self.ypts[-1] >= other.ypts[-1]:
-            ystopnew = round(self.ypts[-1] + self.step, 1)
-        else:
-            ystopnew = round(other.ypts[-1] + self.step, 1)
-        data = np.zeros([ystopnew/self.step + 2, xstopnew/self.step + 2])
+        xstartnew = round(min([self.xpts[0]] + [other.xpts[0] for other in others]), 1) # Select which starting point is smaller
+        ystartnew = round(min([self.ypts[0]] + [other.ypts[0] for other in others]), 1)
+        xstopnew = round(max([self.xpts[-1]] + [other.xpts[-1] for other in others]) + self.step, 1)
+        ystopnew = round(max([self.ypts[-1]] + [other.ypts[-1] for other in others]) + self.step, 1)
+        data = np.zeros([int(round(ystopnew/self.step)) + 2, int(round(xstopnew/self.step)) + 2], dtype = np.int8)
         data[:, :] = -2
-        meshval = np.zeros_like(data)
+        meshval = np.zeros_like(data, dtype = self.meshval.dtype)
         # copying original data and meshval into new multimesh
         data[:self.data.shape[0], :self.data.shape[1]] = self.data[:, :].copy()
         meshval[:self.meshval.shape[0], :self.meshval.shape[1]] = self.meshval[:, :].copy()
         #meshval[:self.meshval.shape[0], round(self.xpts[0] / self.step):round(self.xpts[-1] / self.step)] = self.meshval[:, round(self.xpts[0] / self.step):round(self.xpts[-1] / self.step)].copy()
-        # set the fictitious point values for the other meshgrid            
-        xotherstart = round(other.xpts[0]/other.step)
-        xotherend = round(other.xpts[-1]/other.step)
-        yotherstart = round(other.ypts[0]/other.step)
-        yotherend = round(other.ypts[-1]/other.step)
-        data[yotherstart : yotherend + 3, xotherstart] = -1
-        data[yotherstart, xotherstart : xotherend + 3] = -1
-        data[yotherstart : yotherend + 3, xotherend + 2] = -1
-        data[yotherend + 2, xotherstart : xotherend + 3] = -1
-        # now input internal point values for other meshgrid - to ensure that fictitious points from self is covered
-        data[yotherstart + 1 : yotherend + 2, xotherstart + 1 : xotherend + 2] = other.datanum
+        # indices of the other meshgrids, one row each as in self.idx
+        idxnew = np.array([[round(other.xpts[0]/other.step), round(other.xpts[-1]/other.step),
+                            round(other.ypts[0]/other.step), round(other.ypts[-1]/other.step)] for other in others], dtype = np.intp)
+        for xotherstart, xotherend, yotherstart, yotherend in idxnew:
+            # set the fictitious point values for the other meshgrid
+            data[yotherstart : yotherend + 3, xotherstart] = -1
+            data[yotherstart, xotherstart : xotherend + 3] = -1
+            data[yotherstart : yotherend + 3, xotherend + 2] = -1
+            data[yotherend + 2, xotherstart : xotherend + 3] = -1
+        for (xotherstart, xotherend, yotherstart, yotherend), other in zip(idxnew, others):
+            # now input internal point values for other meshgrid - to ensure that fictitious points from self is covered
+            data[yotherstart + 1 : yotherend + 2, xotherstart + 1 : xotherend + 2] = other.datanum
         # some of the interface values were covered by the new addition - need to copy again the last row
-        for i in np.arange(self.values.shape[0]):
-            data[self.values[i, 6]+1, self.values[i, 3] + 1:self.values[i, 4] + 2] = self.data[self.values[i, 6]+1, self.values[i, 3] + 1:self.values[i, 4] + 2].copy()
-        # finally set the values for ambient temperatures    
-        for i in np.arange(meshval.shape[0]):
-            for j in np.arange(meshval.shape[1]):
-                if data[i, j] == -1:
-                    meshval[i, j] = 0.
-                elif data[i, j] == -2:
-                    meshval[i, j] = 20. + 273. # set temperature of ambient points to Ta = 20 deg C
-                elif data[i, j] == other.datanum: # internal point
-                    meshval[i, j] = other.Tguess
-        self.data = data.copy()
-        self.meshval = meshval.copy()
+        ind = self.idx # xstart, xend, ystart, yend indices of each meshgrid
+        rows = np.repeat(ind[:, 3] + 1, ind[:, 1] - ind[:, 0] + 1)
+        cols = np.concatenate([np.arange(xstart + 1, xend + 2) for xstart, xend in ind[:, :2]])
+        data[rows, cols] = self.data[rows, cols]
+        # finally set the values for ambient temperatures
+        meshval[data == -1] = 0.
+        meshval[data == -2] = 20. + 273. # set temperature of ambient points to Ta = 20 deg C
+        for other in others:
+            meshval[data == other.datanum] = other.Tguess # internal point
+        self.data = data
+        self.meshval = meshval
         self.xpts = np.arange(xstartnew, xstopnew, self.step)
         self.ypts = np.arange(ystartnew, ystopnew, self.step)
-        # now input k, q, Tguess for the new meshgrid
-        values = np.zeros([self.values.shape[0] + 1, 7])
-        values[:-1, :] = self.values.copy()
-        values[-1, 0] = other.k
-        values[-1, 1] = other.q
-        values[-1, 2] = other.Tguess
-        values[-1, 3] = round(other.xpts[0]/self.step)
-        values[-1, 4] = round(other.xpts[-1]/self.step)
-        values[-1, 5] = round(other.ypts[0]/self.step)
-        values[-1, 6] = round(other.ypts[-1]/self.step)
-        self.values = values.copy()
+        # now input k, q, Tguess for the new meshgrids
+        values = np.zeros([self.values.shape[0] + len(others), 7])
+        values[:self.values.shape[0], :] = self.values
+        values[self.values.shape[0]:, 0] = [other.k for other in others]
+        values[self.values.shape[0]:, 1] = [other.q for other in others]
+        values[self.values.shape[0]:, 2] = [other.Tguess for other in others]
+        values[self.values.shape[0]:, 3:7] = idxnew
+        self.values = values
+        self._update_derived()
         return self
         
-    def Jacobiroll(self):
+    def Jacobiroll(self, weight = 1.):
         """
-        Jacobiroll - Jacobi method with pictorial operator represented by 'rolling'
-        the values in the meshgrid.
+        Jacobiroll - one iteration of the Jacobi method with pictorial operator represented by
+        'rolling' the values in the meshgrid. Only the internal points of the materials are
+        updated (by jacobi_sweep_masked), each with the q and k of its own material, into
+        meshvalspare, which is then swapped with meshval. The fictitious and ambient points
+        are left for updatebc.
+        
+        Input:
+            weight : fraction of the Jacobi update applied, 1 for the plain Jacobi method
+            (REQUIRE 0 < weight <= 1)
         """
-        deltax = 1.
-        meshval = self.meshval.copy()
-        count = 1
-        while deltax >= 5e-6:
-            rolldown = np.roll(meshval, 1, axis = 0)
-            rollup = np.roll(meshval, -1, axis = 0)
-            rollright = np.roll(meshval, 1, axis = 1)
-            rollleft = np.roll(meshval, -1, axis = 1)
-            meshvalnew = (rolldown + rollup + rollright + rollleft)/4
-            meshvalnew[self.values[0, 3] + 1:self.values[0, 4] + 2, self.values[0, 5] + 1:self.values[0, 6] + 2] += self.step**2*(0.15/0.5)/4 # for microprocessor
-#            for i in np.arange(self.meshval.shape[0]):
-#                for j in np.arange(self.meshval.shape[1]):
-#                    if self.data[i, j] == -1 or self.data[i, j] == -2:
-#                        meshvalnew[i, j] = self.meshval[i, j].copy()
-#            meshvalnew[:, 0] = self.meshval[:, 0]
-#            meshvalnew[:, -1] = self.meshval[:, -1]
-#            meshvalnew[0, :] = self.meshval[0, :]
-#            meshvalnew[-1, :] = self.meshval[-1, :]
-#            meshvalnew[self.values[0, 3] + 1:self.values[0, 4] + 2, self.values[0, 5] + 1:self.values[0, 6] + 2] = self.meshval[self.values[0, 3] + 1:self.values[0, 4] + 2, self.values[0, 5] + 1:self.values[0, 6] + 2]
-#            meshvalnew[1:6, 86:101] = self.meshval[1:6, 86:101]
-            #intpoints = np.array([])
-            #intpointsnew = np.array([])
-            #for i in np.arange(self.meshval.shape[0]):
-            #    for j in np.arange(self.meshval.shape[1]):
-            #        if self.data[i, j] >= 0:
-            #            intpoints = np.append(intpoints, meshval[i, j])
-            #            meshvalnew += self.step**2*(self.values[self.data[i, j], 1]/self.values[self.data[i, j], 0])/4
-            #            intpointsnew = np.append(intpointsnew, meshvalnew[i, j])
-            deltax = np.abs(np.linalg.norm(meshvalnew) - np.linalg.norm(meshval))/np.linalg.norm(meshval) # only take internal point temperatures and compare
-            #print("Jacobi deltax =", deltax, "count =", count)            
-            meshval = meshvalnew.copy()
-            count += 1
-        self.meshval = meshvalnew.copy() # only change the values in the meshgrid object AFTER finish iterating
+        jacobi_sweep_masked(self.meshval, self.meshvalspare, self.data, self.source, self.intpts, norms = False)
+        if weight != 1.:
+            ii, jj = self.intpts
+            self.meshvalspare[ii, jj] = self.meshval[ii, jj] + weight*(self.meshvalspare[ii, jj] - self.meshval[ii, jj])
+        self.meshval, self.meshvalspare = self.meshvalspare, self.meshval # swap the buffers instead of copying
+        return self
+        
+    def GaussSeidel(self, omega = 1.):
+        """
+        GaussSeidel - one iteration of the red-black Gauss-Seidel method with the same pictorial
+        operator as Jacobiroll, which can be used in its place. The internal points with (i + j)
+        even are updated first and then those with (i + j) odd using the new values, in place,
+        which takes about half as many iterations as the Jacobi method to converge. With
+        omega > 1 this is successive over-relaxation (SOR), which needs fewer iterations still.
+        
+        Input:
+            omega : relaxation factor, 1 for plain Gauss-Seidel (REQUIRE 0 < omega < 2)
+        """
+        redblack_sweep_masked(self.meshval, self.data, self.source, omega, norms = False)
         return self
         
     def updatebc(self, mode = "natural"):
         """
-        updatebc - updates the meshgrid fictitious point values using values calculated
-        from one successful iteration of the Jacobi method.
+        updatebc - updates the meshgrid fictitious point values in place using the values of
+        the internal points next to them, and resets the ambient points.
         
         Input:
             mode : "natural" or "forced" convection
             
         Output:
-            meshvalnew : values on meshgrid with updated boundary values
+            meshval : values on meshgrid with updated boundary values
         """
-        meshvalnew = self.meshval.copy()
-        # set values of fictitious points
-        if mode == "natural":
-            h1 = lambda i, j: 1.31e-6*np.cbrt(self.meshval[i, j + 1] - (20+273))
-        else:
-            h1 = lambda i, j: -(11.4 + 5.7*20)*1e-3
+        return update_bc(self.meshval, self.kmap, self.fictpts, self.fictdirs, self.ambientpts, self.step, mode == "natural", HFORCED, out = self.meshval)
+    
+    def residual(self, meshval = None):
+        """
+        residual - residual of the discretised Poisson's equation at each internal point, i.e.
+        the change one Jacobi iteration would make there. It is the same for every method, so
+        it is used to decide when to stop iterating.
         
-        for i in np.arange(self.meshval.shape[0]):
-            for j in np.arange(self.meshval.shape[1]):
-                if self.data[i, j] == -1:
-                    meshvalarr = np.array([])
-                    if i + 1 < self.meshval.shape[0] and j + 1 < self.meshval.shape[1]:
-                        if self.data[i, j + 1] >= 0: # Locating internal point direction
-
-                            meshvalarr = np.append(meshvalarr, 2*h1(i, j)*self.step*(self.meshval[i, j + 1]-(20.+273.))/self.values[self.data[i, j + 1], 0] + self.meshval[i, j + 2])
-                        if self.data[i + 1, j] >= 0:
-                            if mode == "natural":
-                                h3 = 1.31e-6*np.cbrt(self.meshval[i + 1, j] - (20+273))
-                            if mode == "forced":
-                                h3 = -(11.4 + 5.7*20)*1e-3
-                            meshvalarr = np.append(meshvalarr, 2*h3*self.step*(self.meshval[i + 1, j]-(20.+273.))/self.values[self.data[i + 1, j], 0] + self.meshval[i + 2, j])
-                    if self.data[i, j - 1] >= 0:
-                        if mode == "natural":
-                            h2 = 1.31e-6*np.cbrt(self.meshval[i, j - 1] - (20+273))
-                        if mode == "forced":
-                            h2 = -(11.4 + 5.7*20)*1e-3
-                        meshvalarr = np.append(meshvalarr, 2*h2*self.step*(self.meshval[i, j - 1]-(20.+273.))/self.values[self.data[i, j - 1], 0] + self.meshval[i, j - 2])
-                    if self.data[i - 1, j] >= 0:
-                        if mode == "natural":
-                            h4 = 1.31e-6*np.cbrt(self.meshval[i - 1, j] - (20+273))
-                        if mode == "forced":
-                            h4 = -(11.4 + 5.7*20)*1e-3
-                        meshvalarr = np.append(meshvalarr, 2*h4*self.step*(self.meshval[i - 1, j]-(20.+273.))/self.values[self.data[i - 1, j], 0] + self.meshval[i - 2, j])
-                    if meshvalarr.size > 0:
-                        meshvalnew[i, j] = np.average(meshvalarr)
-                    else:
-                        meshvalnew[i, j] = 20. + 273. # points at the corner, will not affect any calculations of internal point temperature
-                    # set values of ambient points
-                if self.data[i, j] == -2:
-                    meshvalnew[i, j] = 20. + 273.
-        #meshvalnew[:5, :15] = self.meshval[:5, :15]
-        #meshvalnew[:5, 87:] = self.meshval[:5, 87:]
-        self.meshval = meshvalnew.copy()
-        return meshvalnew
+        Input:
+            meshval : values on the meshgrid with up to date fictitious points (self.meshval if None)
+        
+        Output:
+            r : residual at the internal points, in the order of self.intpts
+        """
+        u = self.meshval if meshval is None else meshval
+        ii, jj = self.intpts
+        return 1/4*(u[ii - 1, jj] + u[ii + 1, jj] + u[ii, jj - 1] + u[ii, jj + 1]) + self.source[ii, jj] - u[ii, jj]
+    
+    def correctlevel(self, mode = "natural"):
+        """
+        correctlevel - adds the same amount to the temperature of every internal point so that
+        the heat produced balances the heat lost through the surfaces (the residuals weighted
+        by k sum to zero), then updates the fictitious points. Little heat leaves through the
+        surfaces, so this overall level is what the Jacobi and Gauss-Seidel methods take by
+        far the longest to find. The amount is found with the secant method.
+        
+        Input:
+            mode : "natural" or "forced" convection
+        """
+        ii, jj = self.intpts
+        k = self.kmap[ii, jj]
+        trial = np.empty_like(self.meshval)
+        def imbalance(delta):
+            np.copyto(trial, self.meshval)
+            trial[ii, jj] += delta
+            update_bc(trial, self.kmap, self.fictpts, self.fictdirs, self.ambientpts, self.step, mode == "natural", HFORCED, out = trial)
+            return np.dot(k, self.residual(trial))
+        delta0, f0 = 0., imbalance(0.)
+        delta, f = 1., imbalance(1.)
+        for n in range(50):
+            if f == f0 or abs(delta - delta0) <= 1e-9: # converged, the imbalance is monotonic in delta
+                break
+            delta0, f0, delta = delta, f, delta - f*(delta - delta0)/(f - f0)
+            f = imbalance(delta)
+        self.meshval[ii, jj] += delta
+        self.updatebc(mode)
+        return self
         
     def iterateJacobi(self, mode = "natural"):
         """
         iterateJacobi - Iterative method to determine temperature in the meshgrid until stabilise.
-        This method uses the Jacobi method to repeatedly obtain updated values
-        of surface temperatures through solving the Poisson's equation until the surface
-        temperatures are stabilised.
+        This method uses the weighted Jacobi method (Jacobiroll) to solve the Poisson's equation,
+        with the surface temperatures updated after every iteration. With weight 1, a
+        chequerboard pattern in the temperatures slowly grows instead of dying out.
     
         Input:
             mode : "natural" or "forced" convection        
@@ -285,16 +292,58 @@ class multimesh:
         Output:
             meshval : meshgrid with temperature values at each point (after stabilising)
         """
-        meshval = self.updatebc(mode)
-        deltaave = 1
-        count = 1
-        while deltaave >= 1e-5:
-            self.Jacobiroll()
-            meshvalnew = self.updatebc(mode)
-            deltaave = np.abs(np.average(meshvalnew[self.values[0, 3] + 1:self.values[0, 4] + 2, self.values[0, 5] + 1:self.values[0, 6] + 2]) - np.average(meshval[self.values[0, 3] + 1:self.values[0, 4] + 2, self.values[0, 5] + 1:self.values[0, 6] + 2]))/np.average(meshval[self.values[0, 3] + 1:self.values[0, 4] + 2, self.values[0, 5] + 1:self.values[0, 6] + 2])
-            meshval = meshvalnew.copy()
-            print("iterate deltaave =", deltaave, "count =", count)
+        return self.iterate(lambda: self.Jacobiroll(JACOBI_WEIGHT), mode)
+
+    def iterateRedBlackSOR(self, mode = "natural", omega = OMEGA):
+        """
+        iterateRedBlackSOR - same as iterateJacobi, but solves the Poisson's equation with
+        red-black SOR (GaussSeidel) instead of the Jacobi method, which needs several times
+        fewer iterations.
+    
+        Inputs:
+            mode : "natural" or "forced" convection
+            omega : relaxation factor (REQUIRE 0 < omega < 2, larger values than OMEGA can
+            diverge as the fictitious points lag behind by an iteration)
+        
+        Output:
+            meshval : meshgrid with temperature values at each point (after stabilising)
+        """
+        return self.iterate(lambda: self.GaussSeidel(omega), mode)
+
+    def iterate(self, sweep, mode = "natural"):
+        """
+        iterate - alternates between one iteration of a method solving the Poisson's equation
+        and updating the fictitious points, with the overall temperature level corrected every
+        CORRECT_EVERY iterations (correctlevel). Stops once the largest residual is below RTOL
+        times the largest difference from Ta (or 1 K if smaller, as the solution may be Ta), which
+        does not depend on the method, as opposed to the change made by an iteration. Raises
+        an error if this has not happened after MAX_ITER iterations.
+    
+        Inputs:
+            sweep : function doing one iteration, Jacobiroll or GaussSeidel
+            mode : "natural" or "forced" convection
+        
+        Output:
+            meshval : meshgrid with temperature values at each point (after stabilising)
+        """
+        np.copyto(self.meshvalspare, self.meshval) # only the internal points are written by Jacobiroll
+        self.updatebc(mode)
+        count = 0
+        while True:
+            if count % CORRECT_EVERY == 0:
+                self.correctlevel(mode)
+            if count % CHECK_EVERY == 0: # convergence is only checked every CHECK_EVERY iterations
+                rise = max(np.max(np.abs(self.meshval[self.intpts] - (20. + 273.))), 1.)
+                r = np.max(np.abs(self.residual()))/rise
+                if not np.isfinite(r):
+                    raise ArithmeticError("The iteration diverged, try a smaller omega.")
+                if count % (CORRECT_EVERY*16) == 0: # occasional progress report
+                    print("iterate residual =", r, "count =", count)
+                if r < RTOL:
+                    break
+                if count >= MAX_ITER:
+                    raise ArithmeticError("The iteration did not converge in MAX_ITER = %d iterations." %MAX_ITER)
+            sweep()
+            self.updatebc(mode)
             count += 1
-        self.meshval = meshvalnew.copy() # only change the values in the meshgrid object AFTER finish iterating
         return self
-        
\ No newline at end of file
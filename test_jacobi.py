@@ -1,7 +1,8 @@
+import os
 import numpy as np
 import meshclass as msc
 import multimesh as mm
-import pylab as pl
+from multiprocessing import Pool
 
 # Microprocessor with dimensions 14mm x 1mm, with one point on the meshgrid for
 # every 0.2 mm.
@@ -15,8 +16,6 @@ k_micro = 0.15 # For microprocessor
 q_micro = 0.5 # Heat production within microprocessor
 Tguess_micro = 70. + 273. # initial guess = 70 deg C
 
-micro = msc.meshgrid(xstart_micro, xstop_micro, ystart_micro, ystop_micro, step, k_micro, q_micro, Tguess_micro, 0)
-
 # Ceramic case - this sits on top of the microprocessor, with dimensions 20mm x
 # 2 mm.
 xstart_ceram = 0.
@@ -27,113 +26,110 @@ k_ceram = 0.23
 q_ceram = 0.
 Tguess_ceram = 27. + 273.
 
-ceramic = msc.meshgrid(xstart_ceram, xstop_ceram, ystart_ceram, ystop_ceram, step, k_ceram, q_ceram, Tguess_ceram, 1)
-
-# No heat sink - only microprocessor and ceramic case considered
-# Combine these together into a multimesh
-system = mm.multimesh(micro, ceramic)
-system.iterateJacobi()
-meshvalsystem = system.meshval
-
-# for plotting purposes
-meshvalsystem[:, 0] = np.nan
-meshvalsystem[:, -1] = np.nan
-meshvalsystem[0, :] = np.nan
-meshvalsystem[-1, :] = np.nan
-meshvalsystem[1:6, 1:16] = np.nan
-meshvalsystem[1:6, 86:101] = np.nan
-
-# Plot the values on a mesh plot
-X, Y = np.meshgrid(system.xpts, system.ypts)
-pl.figure()
-nosinkplot = pl.contourf(X, Y, meshvalsystem[1:-1, 1:-1]) # take the internal points only
-pl.title("Mesh plot of temperature without a heat sink")
-pl.xlabel("x / mm")
-pl.ylabel("y / mm")
-pl.colorbar(nosinkplot)
-
-# Heat sink with variable number of fins
-numfins = 7 # Number of fins
-a = 30 # Height of a fin
-b = 5 # Separation between fins
-# Thickness set to 1 mm
-
-# Consider only the case when the length of the heat sink >= length of ceramic. So x = 0 at the start of the heat sink always.
-# The base of the sink
-xstart_sinkbase = 0.
-xstop_sinkbase = (b + 1)*(numfins - 1) + 1 # excluding last fin spacing
-ystart_sinkbase = ystop_ceram
-ystop_sinkbase = ystart_sinkbase + 4.
+# Heat sink - thickness of the base and the fins set to 1 mm
 k_sink = 0.248
 q_sink = 0.
 Tguess_sink = 27. + 273.
 
-sinkbase = msc.meshgrid(xstart_sinkbase, xstop_sinkbase, ystart_sinkbase, ystop_sinkbase, step, k_sink, q_sink, Tguess_sink, 2)
+def result(system, title):
+    """
+    result - values of a multimesh after iterating, for plotting in the main process
     
-shift = (xstop_sinkbase - (xstop_ceram - xstart_ceram))/2
-xstart_micro += shift
-xstop_micro += shift
-xstart_ceram += shift
-xstop_ceram += shift
-micro = msc.meshgrid(xstart_micro, xstop_micro, ystart_micro, ystop_micro, step, k_micro, q_micro, Tguess_micro, 0)
-ceramic = msc.meshgrid(xstart_ceram, xstop_ceram, ystart_ceram, ystop_ceram, step, k_ceram, q_ceram, Tguess_ceram, 1)
-system = mm.multimesh(micro, ceramic) # first insert objects furthest from the centre of the whole system, this way the extent of x- and y-coordinates can be defined
-system.combine(sinkbase)
-
-# The fins on top of the base
-for i in np.arange(numfins):
-    xstart_fin = (b + 1)*i
-    xstop_fin = xstart_fin + 1
-    ystart_fin = ystop_sinkbase
-    ystop_fin = ystart_fin + a
-    fin = msc.meshgrid(xstart_fin, xstop_fin, ystart_fin, ystop_fin, step, k_sink, q_sink, Tguess_sink, 2)
-    system.combine(fin)
-
-system.iterateJacobi()
-meshvalsystem = system.meshval
-
-# for plotting purposes
-for i in np.arange(meshvalsystem.shape[0]):
-    for j in np.arange(meshvalsystem.shape[1]):
-        if system.data[i, j] == -1 or system.data[i, j] == -2:
-            meshvalsystem[i, j] = np.nan
-
-# Plot the values on a mesh plot
-X, Y = np.meshgrid(system.xpts, system.ypts)
-pl.figure()
-sinkplot = pl.contourf(X, Y, meshvalsystem[1:-1, 1:-1]) # take the internal points only
-pl.title("Mesh plot of temperature with a heat sink, with %.0f fins, a = %.0f and b = %.0f (natural)" %(numfins, a, b))
-pl.xlabel("x / mm")
-pl.ylabel("y / mm")
-pl.colorbar(sinkplot)
-
-# Forced convection
-system = mm.multimesh(micro, ceramic) # first insert objects furthest from the centre of the whole system, this way the extent of x- and y-coordinates can be defined
-system.combine(sinkbase)
-
-# The fins on top of the base
-for i in np.arange(numfins):
-    xstart_fin = (b + 1)*i
-    xstop_fin = xstart_fin + 1
+    Inputs:
+        system : multimesh object after iterating
+        title : title of the plot
+    
+    Output:
+        meshvalsystem, extent, title : values with the fictitious and ambient points set to NaN,
+        [left, right, bottom, top] edges of the internal points (each point centred in a
+        step x step pixel) and title of the plot
+    """
+    meshvalsystem = system.meshval.copy() # the multimesh may be iterated again
+    meshvalsystem[(system.data == -1) | (system.data == -2)] = np.nan # fictitious and ambient points, including the outermost ones
+    extent = [system.xpts[0] - step/2, system.xpts[-1] + step/2, system.ypts[0] - step/2, system.ypts[-1] + step/2]
+    return meshvalsystem, extent, title # four numbers rather than the coordinates are sent back to the main process
+
+def solve(config):
+    """
+    solve - builds the system for one configuration and iterates it until the temperatures are
+    stabilised, run in its own process for each configuration
+    
+    Input:
+        config : (numfins, a, b) - number of fins, height of a fin and separation between fins.
+        numfins = 0 for only the microprocessor and ceramic case (no heat sink).
+    
+    Output:
+        list of results (see result), one without a heat sink or two with a heat sink
+        (natural and forced convection)
+    """
+    numfins, a, b = config
+    micro = msc.meshgrid(xstart_micro, xstop_micro, ystart_micro, ystop_micro, step, k_micro, q_micro, Tguess_micro, 0)
+    ceramic = msc.meshgrid(xstart_ceram, xstop_ceram, ystart_ceram, ystop_ceram, step, k_ceram, q_ceram, Tguess_ceram, 1)
+    if numfins == 0:
+        # No heat sink - only microprocessor and ceramic case considered
+        # Combine these together into a multimesh
+        system = mm.multimesh(micro, ceramic)
+        system.iterateRedBlackSOR()
+        return [result(system, "Mesh plot of temperature without a heat sink")]
+    
+    # Consider only the case when the length of the heat sink >= length of ceramic. So x = 0 at the start of the heat sink always.
+    # The base of the sink
+    xstart_sinkbase = 0.
+    xstop_sinkbase = (b + 1)*(numfins - 1) + 1 # excluding last fin spacing
+    ystart_sinkbase = ystop_ceram
+    ystop_sinkbase = ystart_sinkbase + 4.
+    sinkbase = msc.meshgrid(xstart_sinkbase, xstop_sinkbase, ystart_sinkbase, ystop_sinkbase, step, k_sink, q_sink, Tguess_sink, 2)
+    
+    shift = round((xstop_sinkbase - (xstop_ceram - xstart_ceram))/2/step)*step # nearest multiple of step, as required by shift_x
+    micro.shift_x(shift) # centred on the heat sink
+    ceramic.shift_x(shift)
+    system = mm.multimesh(micro, ceramic) # first insert objects furthest from the centre of the whole system, this way the extent of x- and y-coordinates can be defined
+    system.combine(sinkbase)
+    
+    # The fins on top of the base, combined in one go
     ystart_fin = ystop_sinkbase
     ystop_fin = ystart_fin + a
-    fin = msc.meshgrid(xstart_fin, xstop_fin, ystart_fin, ystop_fin, step, k_sink, q_sink, Tguess_sink, 2)
-    system.combine(fin)
-
-system.iterateJacobi("forced")
-meshvalsystem = system.meshval
-
-# for plotting purposes
-for i in np.arange(meshvalsystem.shape[0]):
-    for j in np.arange(meshvalsystem.shape[1]):
-        if system.data[i, j] == -1 or system.data[i, j] == -2:
-            meshvalsystem[i, j] = np.nan
-
-# Plot the values on a mesh plot
-X, Y = np.meshgrid(system.xpts, system.ypts)
-pl.figure()
-windplot = pl.contourf(X, Y, meshvalsystem[1:-1, 1:-1]) # take the internal points only
-pl.title("Mesh plot of temperature with a heat sink, with %.0f fins, a = %.0f and b = %.0f (forced)" %(numfins, a, b))
-pl.xlabel("x / mm")
-pl.ylabel("y / mm")
-pl.colorbar(windplot)
\ No newline at end of file
+    fins = [msc.meshgrid((b + 1)*i, (b + 1)*i + 1, ystart_fin, ystop_fin, step, k_sink, q_sink, Tguess_sink, 2) for i in range(numfins)]
+    system.combine(*fins)
+    
+    initial = system.meshval.copy() # initial guesses, restored for the forced convection run
+    system.iterateRedBlackSOR()
+    results = [result(system, "Mesh plot of temperature with a heat sink, with %.0f fins, a = %.0f and b = %.0f (natural)" %(numfins, a, b))]
+    
+    # Forced convection - same heat sink, only the boundary conditions differ
+    system.meshval[:] = initial
+    system.iterateRedBlackSOR("forced")
+    results.append(result(system, "Mesh plot of temperature with a heat sink, with %.0f fins, a = %.0f and b = %.0f (forced)" %(numfins, a, b)))
+    return results
+
+# Configurations (numfins, a, b), each solved in its own process - add more to compare heat sinks
+configs = [(0, 0, 0), # no heat sink
+           (7, 30, 5)] # 7 fins with height 30 mm and separation 5 mm
+
+def plot(meshvalsystem, extent, title):
+    """
+    plot - shows the temperature at each internal point of a system. matplotlib is only
+    imported here, so that it is not loaded by the processes solving the configurations or
+    when plotting is skipped.
+    
+    Inputs:
+        meshvalsystem, extent, title : result of a configuration (see result)
+    """
+    import matplotlib.pyplot as plt
+    fig = plt.figure()
+    image = plt.imshow(meshvalsystem[1:-1, 1:-1], origin = "lower", aspect = "auto", extent = extent) # take the internal points only
+    plt.title(title)
+    plt.xlabel("x / mm")
+    plt.ylabel("y / mm")
+    plt.colorbar(image)
+    plt.show()
+    plt.close(fig) # free the figure before the next one
+
+if __name__ == "__main__":
+    with Pool(len(configs)) as pool:
+        results = pool.map(solve, configs)
+    
+    if os.environ.get("HEAT_NO_PLOT") != "1": # set HEAT_NO_PLOT=1 to only solve, e.g. for a sweep
+        for config in results:
+            for meshvalsystem, extent, title in config:
+                plot(meshvalsystem, extent, title)